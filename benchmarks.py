@@ -0,0 +1,211 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import itertools
+import subprocess
+import resource
+import numpy as np
+from tankbattle.env.constants import GlobalConstants
+
+# Every case runs in its own process so that peak RSS and caches are not shared between cases.
+# Results are written as JSON to compare runs and backends over time, e.g.
+#   python benchmarks.py --duration 5 --output bench.json
+#   python benchmarks.py --full --backend sprite vector
+#   python benchmarks.py --scaling --backend sprite vector
+# ArrayCore is only benchmarked through VecTankBattle: ArrayTankBattle runs it for a single game, which is not
+# what it is built for
+
+BACKENDS = ["sprite", "vector"]
+STATE_MODES = ["none", GlobalConstants.RGB_STATE, GlobalConstants.GRAY_STATE, GlobalConstants.GRID_STATE]
+
+BASE_CASE = {
+    "backend": "sprite",
+    "render": False,
+    "frame_skip": 1,
+    "num_of_enemies": 5,
+    "two_players": True,
+    "state_mode": "none",
+    "num_of_envs": 1,
+    "num_of_tiles": 13,
+    "tile_size": GlobalConstants.TILE_SIZE,
+    "random_stages": False
+}
+
+VARIATIONS = {
+    "render": [False, True],
+    "frame_skip": [1, 4],
+    "num_of_enemies": [5, 20, 50, 100, 200],
+    "two_players": [True, False],
+    "state_mode": STATE_MODES,
+    "random_stages": [False, True]
+}
+
+# Step time against arena size and enemy count (grid states, small tiles so that large arenas fit in memory)
+SCALING = {
+    "num_of_tiles": [13, 32, 64, 128],
+    "num_of_enemies": [5, 50, 200]
+}
+SCALING_CASE = {"state_mode": GlobalConstants.GRID_STATE, "tile_size": 10}
+
+
+def create_game(case):
+    state_mode = case["state_mode"] if case["state_mode"] != "none" else GlobalConstants.RGB_STATE
+    arena = dict(num_of_tiles=case["num_of_tiles"], tile_size=case["tile_size"], random_stages=case["random_stages"])
+    if case["backend"] == "vector":
+        from tankbattle.env.vector import VecTankBattle
+        return VecTankBattle(case["num_of_envs"], frame_skip=case["frame_skip"], seed=1,
+                             num_of_enemies=case["num_of_enemies"], two_players=case["two_players"],
+                             state_mode=state_mode, **arena)
+    from tankbattle.env.engine import TankBattle
+    return TankBattle(render=case["render"], speed=0, frame_skip=case["frame_skip"], seed=1,
+                      num_of_enemies=case["num_of_enemies"], two_players=case["two_players"],
+                      player1_human_control=False, player2_human_control=False, state_mode=state_mode, **arena)
+
+
+def run_case(case, duration, warmup):
+    # Runs in the child process: one step (plus reading the state) is one latency sample
+    started = time.perf_counter()
+    game = create_game(case)
+    setup_time = time.perf_counter() - started
+
+    rng = np.random.default_rng(0)
+    read_state = case["state_mode"] != "none"
+    is_vector = case["backend"] == "vector"
+    num_of_envs = case["num_of_envs"] if is_vector else 1
+    if is_vector:
+        game.reset()
+    if read_state and not is_vector:
+        out = np.empty(game.get_state().shape, dtype=np.uint8)
+
+    latencies = []
+    resets = 0
+    steps = -warmup
+    end_time = None
+    while end_time is None or time.perf_counter() < end_time:
+        if steps == 0:
+            end_time = time.perf_counter() + duration
+            latencies = []
+            resets = 0
+        actions = rng.integers(0, GlobalConstants.NUM_OF_ACTIONS, (num_of_envs, 2))
+        t = time.perf_counter_ns()
+        if is_vector:
+            game.step(actions)
+        else:
+            game.step(int(actions[0, 0]), int(actions[0, 1]))
+            if read_state:
+                game.get_state(out=out)
+            if game.is_terminal():
+                game.reset()
+                resets = resets + 1
+        latencies.append(time.perf_counter_ns() - t)
+        steps = steps + 1
+
+    latencies = np.array(latencies, dtype=np.float64) / 1000
+    elapsed = latencies.sum() / 1e6
+    return {
+        "case": case,
+        "setup_time": setup_time,
+        "steps": steps,
+        "resets": resets,
+        "steps_per_sec": steps * num_of_envs / elapsed,
+        "frames_per_sec": steps * num_of_envs * max(case["frame_skip"], 1) / elapsed,
+        "latency_us": {
+            "mean": float(latencies.mean()),
+            "p50": float(np.percentile(latencies, 50)),
+            "p90": float(np.percentile(latencies, 90)),
+            "p99": float(np.percentile(latencies, 99)),
+            "max": float(latencies.max())
+        },
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin"
+                                                                            else 1024)
+    }
+
+
+def build_cases(backends, full, num_of_envs, scaling=False):
+    cases = []
+    for backend in backends:
+        base = dict(BASE_CASE, backend=backend)
+        if backend == "vector":
+            # The vector env always returns states
+            base.update(num_of_envs=num_of_envs, state_mode=GlobalConstants.GRID_STATE)
+        if scaling:
+            base.update(SCALING_CASE)
+            keys = list(SCALING)
+            variants = [dict(base, **dict(zip(keys, values)))
+                        for values in itertools.product(*[SCALING[key] for key in keys])]
+        elif full:
+            keys = list(VARIATIONS)
+            variants = [dict(base, **dict(zip(keys, values)))
+                        for values in itertools.product(*[VARIATIONS[key] for key in keys])]
+        else:
+            # One dimension at a time around the base case
+            variants = [base] + [dict(base, **{key: value}) for key, values in VARIATIONS.items()
+                                 for value in values if value != base[key]]
+        for case in variants:
+            # The vector env has no window
+            if backend == "vector" and (case["render"] or case["state_mode"] == "none"):
+                continue
+            if case not in cases:
+                cases.append(case)
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tank Battle benchmarks")
+    parser.add_argument("--backend", nargs="+", default=BACKENDS, choices=BACKENDS)
+    parser.add_argument("--full", action="store_true", help="all combinations instead of one dimension at a time")
+    parser.add_argument("--scaling", action="store_true", help="arena sizes against enemy counts")
+    parser.add_argument("--duration", type=float, default=3.0, help="measured seconds per case")
+    parser.add_argument("--warmup", type=int, default=50, help="steps before measuring")
+    parser.add_argument("--num-of-envs", type=int, default=16, help="games of the vector backend")
+    parser.add_argument("--output", default="benchmarks.json")
+    parser.add_argument("--run-case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case is not None:
+        print(json.dumps(run_case(json.loads(args.run_case), args.duration, args.warmup)))
+        return
+
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    env.setdefault("SDL_AUDIODRIVER", "dummy")
+    env["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    cases = build_cases(args.backend, args.full, args.num_of_envs, args.scaling)
+    results = []
+    for i, case in enumerate(cases):
+        command = [sys.executable, os.path.abspath(__file__), "--run-case", json.dumps(case),
+                   "--duration", str(args.duration), "--warmup", str(args.warmup)]
+        proc = subprocess.run(command, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            result = {"case": case, "error": proc.stderr.strip().splitlines()[-1:]}
+            print("[%d/%d] %s failed: %s" % (i + 1, len(cases), case, result["error"]))
+        else:
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            print("[%d/%d] %s: %.0f steps/s, p99 %.0f us, %.0f MB" % (i + 1, len(cases), case,
+                                                                      result["steps_per_sec"],
+                                                                      result["latency_us"]["p99"],
+                                                                      result["peak_rss_mb"]))
+        results.append(result)
+
+    os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
+    import pygame
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pygame": pygame.version.ver,
+        "duration": args.duration,
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print("Results written to", args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,18 @@
 import collections as cl
 import numpy as np
 from tankbattle.env.engine import TankBattle
-from tankbattle.env.utils import Utils
+from tankbattle.env.constants import GlobalConstants
 
 
 def machine_control(two_players=False):
     exp_replay = cl.deque(maxlen=1000)
     game = TankBattle(render=True, player1_human_control=False, player2_human_control=False, two_players=two_players,
-                      speed=60, debug=True, frame_skip=5)
+                      speed=60, debug=True, frame_skip=5, state_mode=GlobalConstants.GRAY_STATE)
     num_of_actions = game.get_num_of_actions()
     game.reset()
 
-    # Convert state into grayscale (84, 84)
-    state = Utils.process_state(game.get_state())
+    # State in grayscale (84, 84)
+    state = game.get_state()
     
     while True:
         if two_players:
@@ -23,7 +23,7 @@ def machine_control(two_players=False):
             random_action = np.random.randint(0, num_of_actions)
             reward = game.step(random_action)
 
-        next_state = Utils.process_state(game.get_state())
+        next_state = game.get_state()
         is_terminal = game.is_terminal()
 
         ####################################################################
@@ -0,0 +1,332 @@
+import pygame
+import os
+import sys
+import numpy as np
+from tankbattle.env.utils import Utils
+from tankbattle.env.constants import GlobalConstants
+from tankbattle.env.manager import ResourceManager
+from tankbattle.env.maps import StageMap
+from tankbattle.env.states import GrayscaleState
+from tankbattle.env.core import ArrayCore
+from tankbattle.env.renderer import ArrayRenderer
+from tankbattle.env.metrics import Metrics, print_sink
+
+
+class ArrayTankBattle(object):
+    # Same interface as TankBattle (without human control) backed by ArrayCore:
+    # the whole game state lives in NumPy arrays and is only drawn for rendering.
+    # ArrayCore is a batch backend: its per-step cost is paid once for all the games, so a single game runs slower
+    # than TankBattle. ArrayTankBattle is meant to check ArrayCore against TankBattle, use VecTankBattle for speed
+
+    def __init__(self, render=False, speed=60, max_frames=100000, frame_skip=1,
+                 seed=None, num_of_enemies=5, two_players=True, debug=False,
+                 state_mode=GlobalConstants.RGB_STATE, state_size=GlobalConstants.GRAY_STATE_SIZE,
+                 num_of_players=None, num_of_tiles=None, tile_size=GlobalConstants.TILE_SIZE,
+                 bullets_per_tank=None, stages=None, random_stages=False, show_hud=True):
+
+        # The game logic always runs on tiles of GlobalConstants.TILE_SIZE units, tile_size is only the size of
+        # a tile on the screen
+        if num_of_tiles is None:
+            num_of_tiles = GlobalConstants.SCREEN_SIZE // GlobalConstants.TILE_SIZE
+        if num_of_tiles < GlobalConstants.MIN_NUM_OF_TILES:
+            raise ValueError("Invalid parameter ! num_of_tiles must be at least " +
+                             str(GlobalConstants.MIN_NUM_OF_TILES))
+        if tile_size <= 0:
+            raise ValueError("Invalid parameter ! tile_size must be positive")
+
+        # The game plays the built-in stage, or one of the given stages (see StageMap) drawn at every reset, or a
+        # new stage generated from the seed of the game at every reset
+        if random_stages and stages is not None:
+            raise ValueError("Invalid parameter ! stages and random_stages are exclusive")
+
+        # Prepare internal data
+        self.screen_size = num_of_tiles * tile_size
+        self.tile_size = tile_size
+        self.max_frames = max_frames
+        self.rd = render
+        self.screen = None
+        self.display = None
+        self.speed = speed
+        self.num_of_enemies = num_of_enemies
+        self.num_of_actions = GlobalConstants.NUM_OF_ACTIONS
+        self.num_of_tiles = num_of_tiles
+        self.is_debug = debug
+        self.font_size = max(GlobalConstants.FONT_SIZE * tile_size // GlobalConstants.TILE_SIZE, 1)
+        if num_of_players is None:
+            num_of_players = 2 if two_players else 1
+        if num_of_players < 1:
+            raise ValueError("Invalid parameter ! num_of_players must be positive")
+        self.num_of_players = num_of_players
+        self.two_players = num_of_players > 1
+        self.log_freq = 60
+        self.stages = stages
+        self.random_stages = random_stages
+        self.show_hud = show_hud
+        self.current_path = os.path.dirname(os.path.abspath(__file__))
+        self.frame_skip = frame_skip
+        self.state_mode = state_mode
+        self.state_size = state_size
+        self.num_of_objs = 2
+        self.is_dirty = False
+        self.metrics = Metrics(log_freq=self.log_freq)
+        if self.is_debug:
+            self.metrics.add_sink(print_sink)
+
+        # Seed is used to generate a stochastic environment
+        if seed is None or seed < 0 or seed >= 9999:
+            self.seed = np.random.randint(0, 9999)
+            self.random_seed = True
+        else:
+            self.random_seed = False
+            self.seed = seed
+
+        # Initialize
+        self.__init_pygame_engine()
+
+        self.core = ArrayCore(self.stage_map.get_grids(), num_of_games=1,
+                              num_of_players=self.num_of_players, num_of_enemies=self.num_of_enemies,
+                              max_frames=self.max_frames, seed=self.seed, bullets_per_tank=bullets_per_tank,
+                              random_stages=random_stages)
+        self.renderer = ArrayRenderer(self.core, self.rc_manager, self.screen_size, self.tile_size,
+                                      show_hud=show_hud)
+
+        # Render the first frame
+        self.__render()
+
+    @staticmethod
+    def get_game_name():
+        return "TANK BATTLE"
+
+    def clone(self):
+        if self.random_seed:
+            seed = np.random.randint(0, 9999)
+        else:
+            seed = self.seed
+        return ArrayTankBattle(render=self.rd, speed=self.speed, max_frames=self.max_frames,
+                               frame_skip=self.frame_skip, seed=seed, num_of_enemies=self.num_of_enemies,
+                               two_players=self.two_players, debug=self.is_debug, state_mode=self.state_mode,
+                               state_size=self.state_size, num_of_players=self.num_of_players,
+                               num_of_tiles=self.num_of_tiles, tile_size=self.tile_size,
+                               bullets_per_tank=self.core.bullets_per_tank, stages=self.stages,
+                               random_stages=self.random_stages, show_hud=self.show_hud)
+
+    def get_num_of_objectives(self):
+        return self.num_of_objs
+
+    def get_seed(self):
+        return self.seed
+
+    def __init_pygame_engine(self):
+        # Center the screen
+        os.environ['SDL_VIDEO_CENTERED'] = '1'
+
+        # Init Pygame engine
+        pygame.init()
+
+        if self.rd:
+            pygame.display.set_caption(ArrayTankBattle.get_game_name())
+            self.display = pygame.display.set_mode((self.screen_size, self.screen_size))
+        # The canvas of large arenas is only allocated once something is drawn
+        if self.rd or self.state_mode != GlobalConstants.GRID_STATE:
+            self.screen, self.state_view = Utils.create_canvas(self.screen_size, self.screen_size)
+        self.gray_state = GrayscaleState(self.state_size)
+        self.clock = pygame.time.Clock()
+        self.rc_manager = ResourceManager(current_path=self.current_path, font_size=self.font_size,
+                                          tile_size=self.tile_size, is_render=self.rd)
+        self.stage_map = StageMap(self.num_of_tiles, tile_size=self.tile_size, current_path=self.current_path,
+                                  sprites=None, walls=None, resources_manager=self.rc_manager,
+                                  stages=self.stages)
+
+    @property
+    def frames_count(self):
+        return int(self.core.frames[0])
+
+    @property
+    def current_stage(self):
+        return int(self.core.stage[0])
+
+    @property
+    def total_score(self):
+        return int(self.core.total_score[0])
+
+    @property
+    def total_score_p1(self):
+        return int(self.core.scores[0, 0])
+
+    @property
+    def total_score_p2(self):
+        if self.two_players:
+            return int(self.core.scores[0, 1])
+        return 0
+
+    @property
+    def player_scores(self):
+        return self.core.scores[0].tolist()
+
+    def __draw(self):
+        if self.screen is None:
+            self.screen, self.state_view = Utils.create_canvas(self.screen_size, self.screen_size)
+        self.renderer.draw(self.screen, stage=self.current_stage)
+        self.is_dirty = False
+
+    @property
+    def frame_speed(self):
+        return self.metrics.get_stats()["fps_window"]
+
+    def get_info(self):
+        players_bullets = self.core.num_of_players * self.core.bullets_per_tank
+        info = {
+            "players_bullets": int(np.count_nonzero(self.core.bullet_alive[0, :players_bullets])),
+            "enemies_bullets": int(np.count_nonzero(self.core.bullet_alive[0, players_bullets:])),
+            "frame": self.frames_count,
+            "score_p1": self.total_score_p1,
+            "score_p2": self.total_score_p2,
+            "total_score": self.total_score,
+            "players_left": int(np.count_nonzero(self.core.alive[0, :self.core.num_of_players]))
+        }
+        info.update(self.metrics.get_stats())
+        return info
+
+    def __render(self):
+        if self.rd:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    sys.exit()
+
+        self.core.update()
+
+        if self.rd:
+            self.__draw()
+            self.display.blit(self.screen, (0, 0))
+            pygame.display.flip()
+            self.clock.tick(self.speed)
+        else:
+            self.is_dirty = True
+
+        if self.metrics.add_frame():
+            self.metrics.emit(Metrics.FRAME_EVENT, self.get_info())
+
+    def set_seed(self, seed):
+        self.seed = seed
+        self.core.rng = np.random.default_rng(seed)
+
+    def reset(self):
+        started = self.metrics.begin_reset()
+        if len(self.metrics.sinks) > 0:
+            summary = {"episode_frames": self.frames_count, "total_score": self.total_score,
+                       "score_p1": self.total_score_p1, "score_p2": self.total_score_p2}
+
+        self.core.reset()
+        self.__render()
+
+        # The first frame of the new episode is part of the reset latency
+        self.metrics.end_reset(started)
+        if len(self.metrics.sinks) > 0:
+            summary.update(self.metrics.get_stats())
+            self.metrics.emit(Metrics.RESET_EVENT, summary)
+
+    def save_state(self):
+        return self.core.save_state()
+
+    def restore_state(self, state):
+        self.core.restore_state(state)
+        self.is_dirty = True
+
+    def step(self, action, action_p2=-1):
+        actions = [-1] * self.num_of_players
+        actions[0] = action
+        if self.two_players:
+            actions[1] = action_p2
+        rewards = self.step_players(actions)
+        if self.two_players:
+            return rewards[:2]
+        return [rewards[0], 0]
+
+    def step_players(self, actions):
+        # One action per player (negative for no action), returns the rewards of all players
+        if len(actions) != self.num_of_players:
+            raise ValueError("Invalid parameter ! Expected " + str(self.num_of_players) + " actions")
+        self.core.apply_actions([actions])
+
+        for _ in range(max(self.frame_skip, 1)):
+            self.__render()
+
+        self.metrics.add_step()
+        return self.core.collect_rewards()[0].tolist()
+
+    def get_players_alive(self):
+        return self.core.alive[0, :self.num_of_players].tolist()
+
+    def render(self):
+        self.__render()
+
+    def step_all(self, action):
+        r = self.step(action)
+        next_state = self.get_state()
+        terminal = self.is_terminal()
+        return next_state, r, terminal
+
+    def get_state_space(self):
+        if self.state_mode == GlobalConstants.GRAY_STATE:
+            return [self.state_size, self.state_size]
+        if self.state_mode == GlobalConstants.GRID_STATE:
+            return [self.num_of_tiles, self.num_of_tiles, GlobalConstants.NUM_OF_GRID_PLANES]
+        return [self.screen_size, self.screen_size]
+
+    def get_action_space(self):
+        return range(self.num_of_actions)
+
+    def get_state(self, mode=None, out=None, view=False):
+        # mode defaults to the state_mode of the game:
+        # - RGB_STATE: (screen_size, screen_size, 3) uint8 RGB state indexed [x, y]. With view=True a read-only
+        #   view of the screen is returned without copying; it is only valid until the next step
+        # - GRAY_STATE: (state_size, state_size) uint8 grayscale state indexed [x, y]
+        # - GRID_STATE: (num_of_tiles, num_of_tiles, NUM_OF_GRID_PLANES) uint8 tile planes indexed [x, y],
+        #   built from the core without drawing
+        # The state is written into out if given, otherwise into a new array owned by the caller
+        if mode is None:
+            mode = self.state_mode
+        if mode == GlobalConstants.GRID_STATE:
+            if out is None:
+                return self.core.get_grid_states()[0]
+            self.core.get_grid_states(out=out[None])
+            return out
+        if self.is_dirty:
+            self.__draw()
+        if mode == GlobalConstants.GRAY_STATE:
+            return self.gray_state.process(self.screen, out)
+        if mode != GlobalConstants.RGB_STATE:
+            raise ValueError("Invalid parameter ! Unknown state mode: " + str(mode))
+        if view:
+            return self.state_view
+        if out is None:
+            out = np.empty(self.state_view.shape, dtype=np.uint8)
+        pygame.pixelcopy.surface_to_array(out, self.screen)
+        return out
+
+    def get_observations(self, mode=None, out=None):
+        # (num_of_players, ...) states of all players, see TankBattle.get_observations
+        if mode is None:
+            mode = self.state_mode
+        if mode == GlobalConstants.GRID_STATE:
+            if out is None:
+                return self.core.get_player_grid_states()[0]
+            self.core.get_player_grid_states(out=out[None])
+            return out
+        state = self.get_state(mode=mode, view=True)
+        if out is None:
+            out = np.empty((self.num_of_players,) + state.shape, dtype=np.uint8)
+        out[:] = state
+        return out
+
+    def is_terminal(self):
+        return bool(self.core.end_of_game[0])
+
+    def debug(self):
+        print_sink(Metrics.FRAME_EVENT, self.get_info())
+
+    def get_num_of_actions(self):
+        return self.num_of_actions
+
+    def is_render(self):
+        return self.rd
@@ -3,6 +3,9 @@ class GlobalConstants:
     SCREEN_SIZE = 650
     TILE_SIZE = 50
 
+    # Smallest arena (in tiles) with room for the base, the players and the enemies
+    MIN_NUM_OF_TILES = 7
+
     NUM_OF_ACTIONS = 5
 
     LEFT_ACTION = 0
@@ -29,9 +32,10 @@ class GlobalConstants:
     TRANSPARENT_OBJECT = 3
     EXPLOSION_OBJECT = 4
 
+    # Bullets of the players are owned by the index of the player
     PLAYER_1_OWNER = 0
     PLAYER_2_OWNER = 1
-    ENEMY_OWNER = 3
+    ENEMY_OWNER = -1
 
     PLAYER_SPEED = 10
     ENEMY_SPEED = 5
@@ -41,6 +45,23 @@ class GlobalConstants:
     PLAYER_LOADING_TIME = 20
     ENEMY_LOADING_TIME  = 90
 
+    RGB_STATE = "rgb"
+    GRAY_STATE = "gray"
+    GRAY_STATE_SIZE = 84
+    GRID_STATE = "grid"
+
+    # Planes of the grid state
+    GRID_HARD_WALL = 0
+    GRID_SOFT_WALL = 1
+    GRID_SEA = 2
+    GRID_BASE = 3
+    GRID_PLAYER_1 = 4      # direction + 1 (player 1, or the observing player in get_observations)
+    GRID_PLAYER_2 = 5      # direction + 1 (the other players)
+    GRID_ENEMY = 6         # direction + 1
+    GRID_BULLET = 7        # direction + 1
+    GRID_RELOAD = 8        # frames until the tank on the tile can fire again
+    NUM_OF_GRID_PLANES = 9
+
     NUM_OF_TILES = 3
     WALL_TILE = 0
     ROCK_TILE = 1
@@ -0,0 +1,479 @@
+import numpy as np
+from tankbattle.env.utils import Utils
+from tankbattle.env.maps import StageMap
+from tankbattle.env.constants import GlobalConstants
+
+
+class ArrayCore(object):
+    # Cell types of the wall grid
+    EMPTY_CELL = 0
+    HARD_CELL = 1
+    SOFT_CELL = 2
+    SEA_CELL = 3
+    BASE_CELL = 4
+
+    # Number of frames an explosion stays on the screen
+    EXPLOSION_FRAMES = 6
+
+    # Number of random tiles tried when an enemy is (re)spawned
+    SPAWN_CANDIDATES = 16
+
+    ENEMY_SCORE = 10
+
+    # Per-game arrays making up a snapshot
+    STATE_ARRAYS = ("stage", "initial_grid", "player_spawns", "grid", "occupancy", "alive", "pos", "target", "px",
+                    "direction", "fire_time", "loading_time", "speed", "bullet_alive", "bullet_pos", "bullet_dir",
+                    "explosion_age", "explosion_pos", "frames", "end_of_game", "total_score", "scores", "rewards",
+                    "enemy_speed", "enemy_loading_time")
+
+    # (x, y) unit vectors of LEFT, RIGHT, UP and DOWN
+    DIRECTIONS = np.array([[-1, 0], [1, 0], [0, -1], [0, 1]], dtype=np.int32)
+
+    def __init__(self, stage, num_of_games=1, num_of_players=2, num_of_enemies=5, max_frames=100000, seed=None,
+                 bullets_per_tank=None, random_stages=False):
+        # stage is one tile grid, or (num_of_stages, h, w) grids of which every game draws one at every reset.
+        # With random_stages, every reset generates a new stage instead (see StageMap.generate_stage)
+        # Every tank owns bullets_per_tank bullet slots and cannot fire while they are all in flight. By default
+        # there are enough slots to never block a shot, as in TankBattle where only the loading time limits firing
+        if bullets_per_tank is not None and bullets_per_tank < 1:
+            raise ValueError("Invalid parameter ! bullets_per_tank must be positive")
+        self.num_of_games = num_of_games
+        self.num_of_players = num_of_players
+        self.num_of_enemies = num_of_enemies
+        self.num_of_tanks = num_of_players + num_of_enemies
+        self.max_frames = max_frames
+        self.rng = np.random.default_rng(seed)
+        self.random_stages = random_stages
+
+        # Game logic runs in pixels of a GlobalConstants.TILE_SIZE tile
+        self.tile_size = GlobalConstants.TILE_SIZE
+        self.tank_size = self.tile_size - 1
+        self.bullet_size = int(self.tile_size/6)
+        self.bullet_speed = GlobalConstants.BULLET_SPEED
+
+        stages = np.asarray(stage)
+        if stages.ndim == 2:
+            stages = stages[None]
+        self.num_of_stages = len(stages)
+        self.num_of_tiles_y, self.num_of_tiles_x = stages.shape[1:]
+
+        # A bullet crosses the arena in at most crossing_frames frames and a tank fires at most once every
+        # PLAYER_LOADING_TIME + 1 frames (enemies load slower)
+        if bullets_per_tank is None:
+            crossing_frames = -(-max(self.num_of_tiles_x, self.num_of_tiles_y) * self.tile_size // self.bullet_speed)
+            bullets_per_tank = crossing_frames // (GlobalConstants.PLAYER_LOADING_TIME + 1) + 1
+        self.bullets_per_tank = bullets_per_tank
+        self.num_of_bullets = self.num_of_tanks * bullets_per_tank
+
+        self.base_pos = np.array([self.num_of_tiles_x // 2, self.num_of_tiles_y - 2], dtype=np.int32)
+        self.spawn_rows = max(self.num_of_tiles_y // 2 - 1, 2)
+        self.stage_grids = np.array([self.__build_grid(stage) for stage in stages])
+        self.stage_spawns = np.array([Utils.get_player_spawns(stage, num_of_players) for stage in stages],
+                                     dtype=np.int32)
+
+        n, t, b = self.num_of_games, self.num_of_tanks, self.num_of_bullets
+        h, w = self.num_of_tiles_y, self.num_of_tiles_x
+
+        # Map: stage of every game, its grid at the start of the game and the grid with the destroyed walls
+        self.stage = np.zeros(n, dtype=np.int32)
+        self.initial_grid = np.repeat(self.stage_grids[:1], n, axis=0)
+        self.player_spawns = np.repeat(self.stage_spawns[:1], n, axis=0)
+        self.grid = np.zeros((n, h, w), dtype=np.int8)
+        self.occupancy = np.zeros((n, h, w), dtype=np.int8)
+
+        # Tanks: players first, then enemies
+        self.alive = np.zeros((n, t), dtype=bool)
+        self.pos = np.zeros((n, t, 2), dtype=np.int32)
+        self.target = np.zeros((n, t, 2), dtype=np.int32)
+        self.px = np.zeros((n, t, 2), dtype=np.int32)
+        self.direction = np.zeros((n, t), dtype=np.int32)
+        self.fire_time = np.zeros((n, t), dtype=np.int64)
+        self.loading_time = np.zeros((n, t), dtype=np.int64)
+        self.speed = np.zeros((n, t), dtype=np.int32)
+
+        # Bullets: slot b belongs to tank b // bullets_per_tank
+        self.bullet_alive = np.zeros((n, b), dtype=bool)
+        self.bullet_pos = np.zeros((n, b, 2), dtype=np.int32)
+        self.bullet_dir = np.zeros((n, b), dtype=np.int32)
+
+        # Explosions: one slot per tank plus one for the base
+        self.explosion_age = np.full((n, t + 1), -1, dtype=np.int32)
+        self.explosion_pos = np.zeros((n, t + 1, 2), dtype=np.int32)
+
+        # Game status
+        self.frames = np.zeros(n, dtype=np.int64)
+        self.end_of_game = np.zeros(n, dtype=bool)
+        self.total_score = np.zeros(n, dtype=np.int64)
+        self.scores = np.zeros((n, num_of_players), dtype=np.int64)
+        self.rewards = np.zeros((n, num_of_players), dtype=np.int64)
+        self.enemy_speed = np.zeros(n, dtype=np.int32)
+        self.enemy_loading_time = np.zeros(n, dtype=np.int64)
+
+        self.reset()
+
+    def __build_grid(self, stage):
+        grid = np.full(stage.shape, ArrayCore.EMPTY_CELL, dtype=np.int8)
+        grid[stage == GlobalConstants.WALL_TILE] = ArrayCore.SOFT_CELL
+        grid[stage == GlobalConstants.ROCK_TILE] = ArrayCore.HARD_CELL
+        grid[stage == GlobalConstants.SEA_TILE] = ArrayCore.SEA_CELL
+        grid[0, :] = ArrayCore.HARD_CELL
+        grid[-1, :] = ArrayCore.HARD_CELL
+        grid[:, 0] = ArrayCore.HARD_CELL
+        grid[:, -1] = ArrayCore.HARD_CELL
+        grid[self.base_pos[1], self.base_pos[0]] = ArrayCore.BASE_CELL
+        return grid
+
+    def reset(self, games=None):
+        if games is None:
+            games = np.arange(self.num_of_games)
+        else:
+            games = np.asarray(games)
+            if games.dtype == bool:
+                games = np.nonzero(games)[0]
+        if len(games) == 0:
+            return
+
+        self.__select_stages(games)
+        self.grid[games] = self.initial_grid[games]
+        self.occupancy[games] = 0
+        self.alive[games] = False
+        self.bullet_alive[games] = False
+        self.explosion_age[games] = -1
+        self.frames[games] = 0
+        self.end_of_game[games] = False
+        self.total_score[games] = 0
+        self.scores[games] = 0
+        self.rewards[games] = 0
+        self.enemy_speed[games] = GlobalConstants.ENEMY_SPEED
+        self.enemy_loading_time[games] = GlobalConstants.ENEMY_LOADING_TIME
+
+        # Create players
+        p = self.num_of_players
+        spawns = self.player_spawns[games]
+        self.pos[games, :p] = spawns
+        self.target[games, :p] = spawns
+        self.px[games, :p] = spawns * self.tile_size
+        self.direction[games, :p] = GlobalConstants.UP_ACTION
+        self.fire_time[games, :p] = 0
+        self.loading_time[games, :p] = GlobalConstants.PLAYER_LOADING_TIME
+        self.speed[games, :p] = GlobalConstants.PLAYER_SPEED
+        self.alive[games, :p] = True
+        self.occupancy[games[:, None], spawns[..., 1], spawns[..., 0]] = 1
+
+        # Create enemies
+        self.__spawn_enemies()
+
+    def __select_stages(self, games):
+        # Single stage games do not draw from the generator
+        if self.random_stages:
+            for game in games.tolist():
+                stage = StageMap.generate_stage(self.rng, self.num_of_tiles_x)
+                self.initial_grid[game] = self.__build_grid(stage)
+                self.player_spawns[game] = Utils.get_player_spawns(stage, self.num_of_players)
+        elif self.num_of_stages > 1:
+            stages = self.rng.integers(0, self.num_of_stages, len(games))
+            self.stage[games] = stages
+            self.initial_grid[games] = self.stage_grids[stages]
+            self.player_spawns[games] = self.stage_spawns[stages]
+
+    def __spawn_enemies(self):
+        # Place at most one enemy per game and round so that spawns never share a tile. A game where an enemy
+        # found no free tile is crowded: its other dead enemies wait for the next frame
+        pending = ~self.alive[:, self.num_of_players:]
+        while True:
+            games = np.nonzero(pending.any(axis=1))[0]
+            if len(games) == 0:
+                return
+            slots = pending[games].argmax(axis=1)
+            pending[games, slots] = False
+            placed = self.__place_enemies(games, self.num_of_players + slots)
+            pending[games[~placed]] = False
+
+    def __place_enemies(self, games, slots):
+        size = (len(games), ArrayCore.SPAWN_CANDIDATES)
+        xs = self.rng.integers(1, self.num_of_tiles_x - 1, size)
+        ys = self.rng.integers(1, self.spawn_rows, size)
+        free = (self.grid[games[:, None], ys, xs] == ArrayCore.EMPTY_CELL) & \
+               (self.occupancy[games[:, None], ys, xs] == 0)
+
+        # Enemies without a free tile stay dead and are retried in the next frame
+        placed = free.any(axis=1)
+        result = placed
+        choice = free.argmax(axis=1)[placed]
+        games, slots = games[placed], slots[placed]
+        xs, ys = xs[placed, choice], ys[placed, choice]
+
+        self.pos[games, slots, 0] = xs
+        self.pos[games, slots, 1] = ys
+        self.target[games, slots] = self.pos[games, slots]
+        self.px[games, slots] = self.pos[games, slots] * self.tile_size
+        self.direction[games, slots] = self.rng.integers(0, 4, len(games))
+        self.fire_time[games, slots] = 0
+        self.loading_time[games, slots] = self.enemy_loading_time[games]
+        self.speed[games, slots] = self.enemy_speed[games]
+        self.alive[games, slots] = True
+        self.occupancy[games, ys, xs] += 1
+
+        # Increase difficulty
+        harder = games[self.total_score[games] > 200]
+        self.enemy_loading_time[harder] = GlobalConstants.ENEMY_LOADING_TIME - 10
+        return result
+
+    def __move(self, mask, actions):
+        # Tanks still moving to their target ignore the command (and do not count as blocked)
+        idle = (self.pos == self.target).all(axis=2)
+        movers = mask & self.alive & idle
+        n, t = np.nonzero(movers)
+        a = actions[n, t]
+        self.direction[n, t] = a
+
+        dest = self.pos[n, t] + ArrayCore.DIRECTIONS[a]
+        dx, dy = dest[:, 0], dest[:, 1]
+        free = (self.grid[n, dy, dx] == ArrayCore.EMPTY_CELL) & (self.occupancy[n, dy, dx] == 0)
+        n, t, dx, dy = n[free], t[free], dx[free], dy[free]
+
+        # Tanks heading to the same tile: the lowest slot wins
+        cell = (n * self.num_of_tiles_y + dy) * self.num_of_tiles_x + dx
+        order = np.lexsort((t, cell))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = cell[order][1:] != cell[order][:-1]
+        win = order[first]
+        n, t, dx, dy = n[win], t[win], dx[win], dy[win]
+
+        self.target[n, t, 0] = dx
+        self.target[n, t, 1] = dy
+        self.occupancy[n, dy, dx] += 1
+
+        blocked = movers
+        blocked[n, t] = False
+        return blocked
+
+    def __fire(self, mask):
+        k = self.bullets_per_tank
+        ready = mask & self.alive & (self.frames[:, None] - self.fire_time > self.loading_time)
+        free = ~self.bullet_alive.reshape(self.num_of_games, self.num_of_tanks, k)
+        ready &= free.any(axis=2)
+        n, t = np.nonzero(ready)
+        b = t * k + free[n, t].argmax(axis=1)
+
+        self.fire_time[n, t] = self.frames[n]
+        d = self.direction[n, t]
+        half = self.tile_size // 2
+        self.bullet_pos[n, b] = self.target[n, t] * self.tile_size + half - self.bullet_size // 2 + \
+            ArrayCore.DIRECTIONS[d] * half
+        self.bullet_dir[n, b] = d
+        self.bullet_alive[n, b] = True
+
+    def __kill_tanks(self, n, t):
+        self.alive[n, t] = False
+        self.explosion_age[n, t] = 0
+        self.explosion_pos[n, t] = self.px[n, t]
+
+        pos = self.pos[n, t]
+        target = self.target[n, t]
+        self.occupancy[n, pos[:, 1], pos[:, 0]] -= 1
+        moving = (pos != target).any(axis=1)
+        self.occupancy[n[moving], target[moving, 1], target[moving, 0]] -= 1
+        self.target[n, t] = pos
+
+    def __overlap(self, bullets, boxes, box_size):
+        # (N, B, 2) bullets against (N, M, 2) boxes -> (N, B, M)
+        d = boxes[:, None, :, :] - bullets[:, :, None, :]
+        return ((d < self.bullet_size) & (-d < box_size)).all(axis=3)
+
+    def __update_tanks(self):
+        moving = self.alive & (self.pos != self.target).any(axis=2)
+        n, t = np.nonzero(moving)
+        step = np.sign(self.target[n, t] - self.pos[n, t])
+        px = self.px[n, t] + step * self.speed[n, t, None]
+        self.px[n, t] = px
+
+        arrived = (px == self.target[n, t] * self.tile_size).all(axis=1)
+        n, t = n[arrived], t[arrived]
+        pos = self.pos[n, t]
+        self.occupancy[n, pos[:, 1], pos[:, 0]] -= 1
+        self.pos[n, t] = self.target[n, t]
+
+    def __update_bullets(self):
+        step = ArrayCore.DIRECTIONS[self.bullet_dir] * self.bullet_speed
+        self.bullet_pos += step * self.bullet_alive[:, :, None]
+
+    def __update_explosions(self):
+        active = self.explosion_age >= 0
+        self.explosion_age[active] += 1
+        self.explosion_age[self.explosion_age > ArrayCore.EXPLOSION_FRAMES] = -1
+
+    def __enemies_update(self):
+        p = self.num_of_players
+        size = (self.num_of_games, self.num_of_enemies)
+        decision = np.full((self.num_of_games, self.num_of_tanks), -1, dtype=np.int32)
+        retry = np.full((self.num_of_games, self.num_of_tanks), -1, dtype=np.int32)
+        decision[:, p:] = self.rng.integers(0, GlobalConstants.NUM_OF_ACTIONS, size)
+        retry[:, p:] = self.rng.integers(0, GlobalConstants.NUM_OF_ACTIONS, size)
+
+        self.__fire(decision == GlobalConstants.FIRE_ACTION)
+
+        # Keep going in the current direction, otherwise try a random action
+        moving = (decision >= 0) & (decision != GlobalConstants.FIRE_ACTION)
+        blocked = self.__move(moving, self.direction.copy())
+        self.__move(blocked & (retry != GlobalConstants.FIRE_ACTION), retry)
+        reload = blocked & (retry == GlobalConstants.FIRE_ACTION)
+        self.fire_time[reload] = np.broadcast_to(self.frames[:, None], reload.shape)[reload]
+
+    def __hit_players(self, bullets):
+        p = self.num_of_players
+        alive = self.bullet_alive
+        hits = self.__overlap(self.bullet_pos[:, bullets], self.px[:, :p], self.tank_size)
+        hits &= alive[:, bullets, None] & self.alive[:, None, :p]
+        alive[:, bullets] &= ~hits.any(axis=2)
+        n, t = np.nonzero(hits.any(axis=1))
+        self.__kill_tanks(n, t)
+
+    def __hit_base_and_walls(self):
+        n, b = np.nonzero(self.bullet_alive)
+        pos = self.bullet_pos[n, b]
+        x0 = np.clip(pos[:, 0] // self.tile_size, 0, self.num_of_tiles_x - 1)
+        y0 = np.clip(pos[:, 1] // self.tile_size, 0, self.num_of_tiles_y - 1)
+        x1 = np.clip((pos[:, 0] + self.bullet_size - 1) // self.tile_size, 0, self.num_of_tiles_x - 1)
+        y1 = np.clip((pos[:, 1] + self.bullet_size - 1) // self.tile_size, 0, self.num_of_tiles_y - 1)
+        xs = np.stack([x0, x1, x0, x1], axis=1)
+        ys = np.stack([y0, y0, y1, y1], axis=1)
+        games = np.broadcast_to(n[:, None], xs.shape)
+        cells = self.grid[games, ys, xs]
+
+        # Check if it hits the base
+        base_hit = (cells == ArrayCore.BASE_CELL).any(axis=1)
+        games_over = np.unique(n[base_hit])
+        self.end_of_game[games_over] = True
+        self.grid[games_over, self.base_pos[1], self.base_pos[0]] = ArrayCore.EMPTY_CELL
+        self.explosion_age[games_over, -1] = 0
+        self.explosion_pos[games_over, -1] = self.base_pos * self.tile_size
+
+        # Check if it hits the wall -> remove the bullet
+        soft = cells == ArrayCore.SOFT_CELL
+        self.grid[games[soft], ys[soft], xs[soft]] = ArrayCore.EMPTY_CELL
+        stopped = base_hit | (soft | (cells == ArrayCore.HARD_CELL)).any(axis=1)
+        self.bullet_alive[n[stopped], b[stopped]] = False
+
+    def __bullets_update(self):
+        p = self.num_of_players
+        players_bullets = slice(0, p * self.bullets_per_tank)
+        enemies_bullets = slice(p * self.bullets_per_tank, None)
+        alive = self.bullet_alive
+        pos = self.bullet_pos
+
+        # Check if players' bullets hit enemies' bullets
+        hits = self.__overlap(pos[:, players_bullets], pos[:, enemies_bullets], self.bullet_size)
+        hits &= alive[:, players_bullets, None] & alive[:, None, enemies_bullets]
+        alive[:, enemies_bullets] &= ~hits.any(axis=1)
+        alive[:, players_bullets] &= ~hits.any(axis=2)
+
+        # Check if players' bullets hit enemies, the first bullet takes the credit
+        hits = self.__overlap(pos[:, players_bullets], self.px[:, p:], self.tank_size)
+        hits &= alive[:, players_bullets, None] & self.alive[:, None, p:]
+        n, e = np.nonzero(hits.any(axis=1))
+        b = hits.argmax(axis=1)[n, e]
+        self.__kill_tanks(n, p + e)
+        scored = np.zeros(hits.shape[:2], dtype=bool)
+        scored[n, b] = True
+        alive[:, players_bullets] &= ~scored
+        n, b = np.nonzero(scored)
+        owners = b // self.bullets_per_tank
+        np.add.at(self.scores, (n, owners), ArrayCore.ENEMY_SCORE)
+        np.add.at(self.rewards, (n, owners), ArrayCore.ENEMY_SCORE)
+        np.add.at(self.total_score, n, ArrayCore.ENEMY_SCORE)
+
+        # Check if bullets hit players
+        self.__hit_players(players_bullets)
+        self.__hit_players(enemies_bullets)
+
+        self.__hit_base_and_walls()
+
+    def apply_actions(self, actions):
+        # actions: (num_of_games, num_of_players), negative values mean no action
+        actions = np.asarray(actions).reshape(self.num_of_games, self.num_of_players)
+        commands = np.full((self.num_of_games, self.num_of_tanks), -1, dtype=np.int32)
+        commands[:, :self.num_of_players] = actions
+        self.__move((commands >= 0) & (commands < GlobalConstants.FIRE_ACTION), commands)
+        self.__fire(commands == GlobalConstants.FIRE_ACTION)
+
+    def update(self):
+        self.__update_explosions()
+        self.__update_tanks()
+        self.__update_bullets()
+        self.__enemies_update()
+        self.__bullets_update()
+        self.__spawn_enemies()
+
+        self.end_of_game |= ~self.alive[:, :self.num_of_players].any(axis=1)
+        self.frames += 1
+        if self.max_frames > 0:
+            self.end_of_game |= self.frames > self.max_frames
+
+    def save_state(self, game=0):
+        # Copies of the arrays of one game plus the state of the random generator (shared by all games)
+        state = {name: getattr(self, name)[game].copy() for name in ArrayCore.STATE_ARRAYS}
+        state["rng"] = self.rng.bit_generator.state
+        return state
+
+    def restore_state(self, state, game=0):
+        for name in ArrayCore.STATE_ARRAYS:
+            getattr(self, name)[game] = state[name]
+        self.rng.bit_generator.state = state["rng"]
+
+    def get_grid_states(self, out=None):
+        # (num_of_games, num_of_tiles_x, num_of_tiles_y, NUM_OF_GRID_PLANES) uint8 states indexed [game, x, y]
+        if out is None:
+            out = np.zeros((self.num_of_games, self.num_of_tiles_x, self.num_of_tiles_y,
+                            GlobalConstants.NUM_OF_GRID_PLANES), dtype=np.uint8)
+        else:
+            out[:] = 0
+        grid = self.grid.transpose(0, 2, 1)
+        out[..., GlobalConstants.GRID_HARD_WALL] = grid == ArrayCore.HARD_CELL
+        out[..., GlobalConstants.GRID_SOFT_WALL] = grid == ArrayCore.SOFT_CELL
+        out[..., GlobalConstants.GRID_SEA] = grid == ArrayCore.SEA_CELL
+        out[..., GlobalConstants.GRID_BASE] = grid == ArrayCore.BASE_CELL
+
+        # Tanks on the tile closest to their current position
+        n, t = np.nonzero(self.alive)
+        tiles = (self.px[n, t] + self.tile_size // 2) // self.tile_size
+        x, y = tiles[:, 0], tiles[:, 1]
+        planes = np.where(t == 0, GlobalConstants.GRID_PLAYER_1,
+                          np.where(t < self.num_of_players, GlobalConstants.GRID_PLAYER_2, GlobalConstants.GRID_ENEMY))
+        out[n, x, y, planes] = self.direction[n, t] + 1
+        reload = self.fire_time[n, t] + self.loading_time[n, t] + 1 - self.frames[n]
+        out[n, x, y, GlobalConstants.GRID_RELOAD] = np.clip(reload, 0, 255)
+
+        # Bullets on the tile of their centre
+        n, b = np.nonzero(self.bullet_alive)
+        tiles = (self.bullet_pos[n, b] + self.bullet_size // 2) // self.tile_size
+        x = np.clip(tiles[:, 0], 0, self.num_of_tiles_x - 1)
+        y = np.clip(tiles[:, 1], 0, self.num_of_tiles_y - 1)
+        out[n, x, y, GlobalConstants.GRID_BULLET] = self.bullet_dir[n, b] + 1
+        return out
+
+    def get_player_grid_states(self, out=None):
+        # (num_of_games, num_of_players, ...) grid states centred on each player: GRID_PLAYER_1 holds the tank of
+        # the player itself and GRID_PLAYER_2 the other players. The grid of player 1 is get_grid_states()
+        p = self.num_of_players
+        if out is None:
+            out = np.empty((self.num_of_games, p, self.num_of_tiles_x, self.num_of_tiles_y,
+                            GlobalConstants.NUM_OF_GRID_PLANES), dtype=np.uint8)
+        self.get_grid_states(out=out[:, 0])
+        if p == 1:
+            return out
+        out[:, 1:] = out[:, :1]
+        out[:, 1:, :, :, GlobalConstants.GRID_PLAYER_1:GlobalConstants.GRID_PLAYER_2 + 1] = 0
+        n, t = np.nonzero(self.alive[:, :p])
+        tiles = (self.px[n, t] + self.tile_size // 2) // self.tile_size
+        x, y = tiles[:, 0], tiles[:, 1]
+        direction = self.direction[n, t] + 1
+        for player in range(1, p):
+            planes = np.where(t == player, GlobalConstants.GRID_PLAYER_1, GlobalConstants.GRID_PLAYER_2)
+            out[n, player, x, y, planes] = direction
+        return out
+
+    def collect_rewards(self):
+        rewards = self.rewards.copy()
+        self.rewards[:] = 0
+        return rewards
@@ -12,20 +12,43 @@ from tankbattle.env.sprites.explosion import ExplosionSprite
 from tankbattle.env.sprites.bullet import BulletSprite
 from tankbattle.env.manager import ResourceManager
 from tankbattle.env.maps import StageMap
+from tankbattle.env.states import GrayscaleState
+from tankbattle.env.spatial import OccupancyGrid, SpatialHash
+from tankbattle.env.metrics import Metrics, print_sink
 
 
 class TankBattle(object):
 
     def __init__(self, render=False, speed=60, max_frames=100000, frame_skip=1,
                  seed=None, num_of_enemies=5, two_players=True, player1_human_control=True,
-                 player2_human_control=False, debug=False):
+                 player2_human_control=False, debug=False, state_mode=GlobalConstants.RGB_STATE,
+                 state_size=GlobalConstants.GRAY_STATE_SIZE, num_of_players=None, num_of_tiles=None,
+                 tile_size=GlobalConstants.TILE_SIZE, stages=None, random_stages=False, show_hud=True):
+
+        # The arena has num_of_tiles x num_of_tiles tiles. The game logic always runs on tiles of
+        # GlobalConstants.TILE_SIZE units (logic_tile_size), tile_size is only the size of a tile on the screen
+        if num_of_tiles is None:
+            num_of_tiles = GlobalConstants.SCREEN_SIZE // GlobalConstants.TILE_SIZE
+        if num_of_tiles < GlobalConstants.MIN_NUM_OF_TILES:
+            raise ValueError("Invalid parameter ! num_of_tiles must be at least " +
+                             str(GlobalConstants.MIN_NUM_OF_TILES))
+        if tile_size <= 0:
+            raise ValueError("Invalid parameter ! tile_size must be positive")
+
+        # The game plays the built-in stage, or one of the given stages (see StageMap) drawn at every reset, or a
+        # new stage generated from the seed of the game at every reset
+        if random_stages and stages is not None:
+            raise ValueError("Invalid parameter ! stages and random_stages are exclusive")
 
         # Prepare internal data
-        self.screen_size = GlobalConstants.SCREEN_SIZE
-        self.tile_size = GlobalConstants.TILE_SIZE
+        self.screen_size = num_of_tiles * tile_size
+        self.tile_size = tile_size
+        self.logic_tile_size = GlobalConstants.TILE_SIZE
+        self.bullet_size = int(self.logic_tile_size/6)
         self.max_frames = max_frames
         self.rd = render
         self.screen = None
+        self.display = None
         self.speed = speed
         self.num_of_enemies = num_of_enemies
         self.sprites = pygame.sprite.Group()
@@ -37,35 +60,73 @@ class TankBattle(object):
         self.walls = pygame.sprite.Group()
         self.booms = pygame.sprite.Group()
         self.num_of_actions = GlobalConstants.NUM_OF_ACTIONS
-        self.num_of_tiles = int(self.screen_size/self.tile_size)
+        self.num_of_tiles = num_of_tiles
         self.end_of_game = False
         self.is_debug = debug
         self.frames_count = 0
         self.total_score = 0
-        self.total_score_p1 = 0
-        self.total_score_p2 = 0
         self.enemy_update_freq = 1
         self.bullet_speed = GlobalConstants.BULLET_SPEED
-        self.font_size = GlobalConstants.FONT_SIZE
+        self.font_size = max(GlobalConstants.FONT_SIZE * tile_size // GlobalConstants.TILE_SIZE, 1)
         self.player1_human_control = player1_human_control
         self.player2_human_control = player2_human_control
-        self.two_players = two_players
+
+        # Players 1 and 2 can be human controlled, the others are always controlled through step_players()
+        if num_of_players is None:
+            num_of_players = 2 if two_players else 1
+        if num_of_players < 1:
+            raise ValueError("Invalid parameter ! num_of_players must be positive")
+        self.num_of_players = num_of_players
+        self.two_players = num_of_players > 1
+        self.player_tanks = []
+        self.player_scores = [0] * num_of_players
+        self.next_rewards = [cl.deque(maxlen=100) for _ in range(num_of_players)]
         self.log_freq = 60
         if self.log_freq == 0:
             self.log_freq = 60
         self.current_stage = 0
+        self.stages = stages
+        self.random_stages = random_stages
+        self.show_hud = show_hud
         self.current_path = os.path.dirname(os.path.abspath(__file__))
         self.player_speed = GlobalConstants.PLAYER_SPEED
         self.enemy_speed = GlobalConstants.ENEMY_SPEED
         self.enemy_bullet_loading_time = GlobalConstants.ENEMY_LOADING_TIME
-        self.current_buffer = np.array([[[0, 0, 0] for _ in range(self.screen_size)] for _ in range(self.screen_size)])
         self.pareto_solutions = None
-        self.frame_speed = 0
         self.frame_skip = frame_skip
-        self.started_time = Utils.get_current_time()
-        self.next_rewards_p1 = cl.deque(maxlen=100)
-        self.next_rewards_p2 = cl.deque(maxlen=100)
+        self.state_mode = state_mode
+        self.state_size = state_size
         self.num_of_objs = 2
+        self.is_dirty = False
+        self.pending_enemies = 0
+        self.recorder = None
+        self.profiler = None
+        self.metrics = Metrics(log_freq=self.log_freq)
+        if self.is_debug:
+            self.metrics.add_sink(print_sink)
+        self.occupancy = OccupancyGrid(self.num_of_tiles)
+        self.static_grid = None
+        self.static_changes = []
+        self.grid_tiles = ([], [])
+
+        # Pristine stage and tanks: walls, base and their occupancy are built once per stage. Player tanks are
+        # respawned by reset, destroyed enemy tanks wait in enemy_pool until an enemy spawns
+        self.stage_walls = []
+        self.static_sprites = set()
+        self.static_occupancy = None
+        self.enemy_pool = []
+
+        # Drawing: walls and base are drawn once on the background, moving sprites and the score are redrawn
+        # over the rectangles they covered in the previous frame (None when the whole screen must be redrawn)
+        self.background = None
+        self.background_sprites = None
+        self.dirty_rects = None
+        self.display_rects = None
+        self.hud_texts = {}
+        self.walls_hash = SpatialHash(self.logic_tile_size, self.walls)
+        self.enemies_hash = SpatialHash(self.logic_tile_size, self.enemies)
+        self.bullets_player_hash = SpatialHash(self.logic_tile_size, self.bullets_player)
+        self.bullets_enemy_hash = SpatialHash(self.logic_tile_size, self.bullets_enemy)
 
         if self.player1_human_control or self.player2_human_control:
             if not self.rd:
@@ -78,13 +139,16 @@ class TankBattle(object):
         else:
             self.random_seed = False
             self.seed = seed
-            np.random.seed(seed)
+
+        # Every game draws from its own generator so that games sharing a process do not affect each other
+        self.rng = np.random.default_rng(self.seed)
 
         # Initialize
         self.__init_pygame_engine()
 
-        # Create base and walls
-        self.__generate_base_and_walls()
+        # Create base and walls, and load the map
+        self.__select_stage()
+        self.__build_stage()
 
         # Create players
         self.__generate_players()
@@ -92,9 +156,6 @@ class TankBattle(object):
         # Create enemies
         self.__generate_enemies(self.num_of_enemies)
 
-        # Load map
-        self.stage_map.load_map(self.current_stage)
-
         # Render the first frame
         self.__render()
 
@@ -111,8 +172,10 @@ class TankBattle(object):
                           seed=seed, num_of_enemies=self.num_of_enemies, two_players=self.two_players,
                           player1_human_control=self.player1_human_control,
                           player2_human_control=self.player2_human_control,
-                          debug=self.is_debug
-                          )
+                          debug=self.is_debug, state_mode=self.state_mode, state_size=self.state_size,
+                          num_of_players=self.num_of_players, num_of_tiles=self.num_of_tiles,
+                          tile_size=self.tile_size, stages=self.stages, random_stages=self.random_stages,
+                          show_hud=self.show_hud)
 
     def get_num_of_objectives(self):
         return self.num_of_objs
@@ -140,18 +203,28 @@ class TankBattle(object):
 
         if self.rd:
             pygame.display.set_caption(TankBattle.get_game_name())
-            self.screen = pygame.display.set_mode((self.screen_size, self.screen_size))
-        else:
-            self.screen = pygame.Surface((self.screen_size, self.screen_size))
+            self.display = pygame.display.set_mode((self.screen_size, self.screen_size))
+        # The canvas of large arenas is only allocated once something is drawn
+        if self.rd or self.state_mode != GlobalConstants.GRID_STATE:
+            self.screen, self.state_view = Utils.create_canvas(self.screen_size, self.screen_size)
+        self.gray_state = GrayscaleState(self.state_size)
+        self.clock = pygame.time.Clock()
         self.rc_manager = ResourceManager(current_path=self.current_path, font_size=self.font_size,
                                           tile_size=self.tile_size, is_render=self.rd)
-        self.font = self.rc_manager.get_font()
-        self.stage_map = StageMap(self.num_of_tiles, tile_size=self.tile_size, current_path=self.current_path,
-                                  sprites=self.sprites, walls=self.walls, resources_manager=self.rc_manager)
+        self.stage_map = StageMap(self.num_of_tiles, tile_size=self.logic_tile_size, current_path=self.current_path,
+                                  sprites=self.sprites, walls=self.walls, resources_manager=self.rc_manager,
+                                  stages=self.stages)
+
+    def __select_stage(self):
+        # Single stage games do not draw from the generator
+        if self.random_stages:
+            self.stage_map.generate(self.current_stage, self.rng)
+        elif self.stage_map.number_of_stages() > 1:
+            self.current_stage = int(self.rng.integers(self.stage_map.number_of_stages()))
 
     def __generate_base_and_walls(self):
         # Create a base
-        self.base = BaseSprite(self.tile_size, pos_x=int(self.num_of_tiles / 2), pos_y=self.num_of_tiles - 2,
+        self.base = BaseSprite(self.logic_tile_size, pos_x=int(self.num_of_tiles / 2), pos_y=self.num_of_tiles - 2,
                                sprite_bg=self.rc_manager.get_image(ResourceManager.BASE))
         self.sprites.add(self.base)
         self.bases.add(self.base)
@@ -159,58 +232,101 @@ class TankBattle(object):
         # Create walls
         wall_bg = self.rc_manager.get_image(ResourceManager.HARD_WALL)
         for i in range(self.num_of_tiles):
-            wall_top = WallSprite(self.tile_size, i, 0, wall_bg)
+            wall_top = WallSprite(self.logic_tile_size, i, 0, wall_bg)
             self.sprites.add(wall_top)
             self.walls.add(wall_top)
 
-            wall_bottom = WallSprite(self.tile_size, i, self.num_of_tiles-1, wall_bg)
+            wall_bottom = WallSprite(self.logic_tile_size, i, self.num_of_tiles-1, wall_bg)
             self.sprites.add(wall_bottom)
             self.walls.add(wall_bottom)
 
-            wall_left = WallSprite(self.tile_size, 0, i, wall_bg)
+            wall_left = WallSprite(self.logic_tile_size, 0, i, wall_bg)
             self.sprites.add(wall_left)
             self.walls.add(wall_left)
 
-            wall_right = WallSprite(self.tile_size, self.num_of_tiles-1, i, wall_bg)
+            wall_right = WallSprite(self.logic_tile_size, self.num_of_tiles-1, i, wall_bg)
             self.sprites.add(wall_right)
             self.walls.add(wall_right)
 
-    def __generate_players(self):
+    def __occupy_static_objects(self):
+        self.walls_hash.invalidate()
+        self.static_grid = None
+        self.background_sprites = None
+        self.stage_walls = self.walls.sprites()
+        self.static_sprites = set(self.stage_walls)
+        self.static_sprites.add(self.base)
+        self.static_occupancy = np.zeros_like(self.occupancy.cells)
+        for sprite in self.static_sprites:
+            self.static_occupancy[sprite.pos_y, sprite.pos_x] += 1
+        self.occupancy.cells += self.static_occupancy
+
+    def __build_stage(self):
+        # Walls and base of the current stage, created again
+        for sprite in self.static_sprites:
+            sprite.kill()
+        self.__generate_base_and_walls()
+        self.stage_map.load_map(self.current_stage)
+        self.__occupy_static_objects()
+
+    @property
+    def player1(self):
+        return self.player_tanks[0]
+
+    @property
+    def player2(self):
+        return self.player_tanks[1] if self.num_of_players > 1 else None
+
+    @property
+    def total_score_p1(self):
+        return self.player_scores[0]
 
-        self.player1 = TankSprite(self.tile_size, pos_x=int(self.num_of_tiles / 2) - 2, pos_y=self.num_of_tiles - 2,
-                                  sprite_bg=(self.rc_manager.get_image(ResourceManager.PLAYER1_LEFT),
-                                             self.rc_manager.get_image(ResourceManager.PLAYER1_RIGHT),
-                                             self.rc_manager.get_image(ResourceManager.PLAYER1_UP),
-                                             self.rc_manager.get_image(ResourceManager.PLAYER1_DOWN)),
-                                  is_enemy=False, bullet_loading_time=GlobalConstants.PLAYER_LOADING_TIME,
-                                  speed=self.player_speed,
-                                  auto_control=self.player1_human_control)
-        self.sprites.add(self.player1)
-        self.players.add(self.player1)
-
-        if self.two_players:
-            self.player2 = TankSprite(self.tile_size, pos_x=int(self.num_of_tiles / 2) + 2, pos_y=self.num_of_tiles - 2,
-                                      sprite_bg=(self.rc_manager.get_image(ResourceManager.PLAYER2_LEFT),
-                                                 self.rc_manager.get_image(ResourceManager.PLAYER2_RIGHT),
-                                                 self.rc_manager.get_image(ResourceManager.PLAYER2_UP),
-                                                 self.rc_manager.get_image(ResourceManager.PLAYER2_DOWN)),
-                                      is_enemy=False, bullet_loading_time=GlobalConstants.PLAYER_LOADING_TIME,
-                                      speed=self.player_speed, auto_control=True)
-            self.sprites.add(self.player2)
-            self.players.add(self.player2)
+    @property
+    def total_score_p2(self):
+        return self.player_scores[1] if self.num_of_players > 1 else 0
+
+    def __generate_players(self):
+        spawns = Utils.get_player_spawns(self.stage_map.get_grid(self.current_stage), self.num_of_players)
+        if len(self.player_tanks) == 0:
+            for i, (pos_x, pos_y) in enumerate(spawns):
+                player = TankSprite(self.logic_tile_size, pos_x=pos_x, pos_y=pos_y,
+                                    sprite_bg=self.rc_manager.get_tank_images(i),
+                                    is_enemy=False, bullet_loading_time=GlobalConstants.PLAYER_LOADING_TIME,
+                                    speed=self.player_speed,
+                                    auto_control=self.player1_human_control if i == 0 else True,
+                                    occupancy=self.occupancy)
+                self.player_tanks.append(player)
+        else:
+            for player, (pos_x, pos_y) in zip(self.player_tanks, spawns):
+                player.respawn(pos_x, pos_y, GlobalConstants.UP_ACTION, GlobalConstants.PLAYER_LOADING_TIME,
+                               self.player_speed)
+        self.sprites.add(self.player_tanks)
+        self.players.add(self.player_tanks)
 
     def __generate_enemies(self, num_of_enemies):
-        for _ in range(num_of_enemies):
-            x = np.random.randint(1, self.num_of_tiles-1)
-            y = np.random.randint(1, int(self.num_of_tiles / 2)-1)
-            enemy = TankSprite(self.tile_size, pos_x=x, pos_y=y,
-                               sprite_bg=(self.rc_manager.get_image(ResourceManager.ENEMY_LEFT),
-                                          self.rc_manager.get_image(ResourceManager.ENEMY_RIGHT),
-                                          self.rc_manager.get_image(ResourceManager.ENEMY_UP),
-                                          self.rc_manager.get_image(ResourceManager.ENEMY_DOWN)),
-                               is_enemy=True, bullet_loading_time=self.enemy_bullet_loading_time,
-                               speed=self.enemy_speed,
-                               auto_control=True)
+        num_of_enemies = num_of_enemies + self.pending_enemies
+        self.pending_enemies = 0
+        choices = self.rng.random(num_of_enemies)
+        directions = self.rng.integers(0, 4, num_of_enemies)
+        for i in range(num_of_enemies):
+            # Spawn on a free tile of the top half, or retry in the next frame if there is none
+            xs, ys = self.occupancy.free_tiles(1, self.num_of_tiles-1, 1, int(self.num_of_tiles / 2)-1)
+            if len(xs) == 0:
+                self.pending_enemies = num_of_enemies - i
+                break
+            index = int(choices[i] * len(xs))
+            if len(self.enemy_pool) > 0:
+                # The buckets may still hold the tank at its old position
+                enemy = self.enemy_pool.pop()
+                enemy.respawn(int(xs[index]), int(ys[index]), int(directions[i]), self.enemy_bullet_loading_time,
+                              self.enemy_speed)
+                self.enemies_hash.invalidate()
+            else:
+                enemy = TankSprite(self.logic_tile_size, pos_x=int(xs[index]), pos_y=int(ys[index]),
+                                   sprite_bg=self.rc_manager.get_tank_images(None),
+                                   is_enemy=True, bullet_loading_time=self.enemy_bullet_loading_time,
+                                   speed=self.enemy_speed,
+                                   auto_control=True, occupancy=self.occupancy, direction=int(directions[i]))
+                self.enemies_hash.add(enemy)
             self.sprites.add(enemy)
             self.enemies.add(enemy)
 
@@ -224,49 +340,58 @@ class TankBattle(object):
                 self.enemy_bullet_loading_time = GlobalConstants.ENEMY_LOADING_TIME - 20
 
     def __enemies_update(self):
+        if self.pending_enemies > 0:
+            self.__generate_enemies(0)
         if self.frames_count % self.enemy_update_freq == 0:
-            for enemy in self.enemies:
-                rand_action = np.random.randint(0, self.num_of_actions)
+            # Two random actions per enemy and frame: the second one is used when the enemy is blocked
+            actions = self.rng.integers(0, self.num_of_actions, (len(self.enemies), 2)).tolist()
+            for enemy, (rand_action, next_action) in zip(self.enemies, actions):
                 if rand_action != GlobalConstants.FIRE_ACTION:
                     rand_action = enemy.direction
-                    if not enemy.move(rand_action, self.sprites):
-                        rand_action = np.random.randint(0, self.num_of_actions)
-                        if rand_action != GlobalConstants.FIRE_ACTION:
-                            enemy.move(rand_action, self.sprites)
+                    if not enemy.move(rand_action):
+                        if next_action != GlobalConstants.FIRE_ACTION:
+                            enemy.move(next_action)
                         else:
                             enemy.fire_started_time = self.frames_count
                 else:
                     self.__fire_bullet(enemy, True)
 
-    def __draw_score(self):
-        total_score = self.font.render('Score:' + str(self.total_score), False, Utils.get_color(Utils.WHITE))
-        self.screen.blit(total_score, (self.screen_size/2 - total_score.get_width()/2,
-                                       self.screen_size-self.tile_size + total_score.get_height()/1.3))
-
-        p1_score = self.font.render('P1:' + str(self.total_score_p1), False, Utils.get_color(Utils.WHITE))
-        self.screen.blit(p1_score, (10, self.screen_size-self.tile_size + p1_score.get_height()/1.3))
-
-        p2_score = self.font.render('P2:' + str(self.total_score_p2), False, Utils.get_color(Utils.WHITE))
-        self.screen.blit(p2_score, (self.screen_size - p2_score.get_width() - 10,
-                                    self.screen_size-self.tile_size + p2_score.get_height()/1.3))
+    def __hud_text(self, name, text):
+        # Texts are only rendered again when they change
+        cached = self.hud_texts.get(name)
+        if cached is None or cached[0] != text:
+            cached = (text, self.rc_manager.get_font().render(text, False, Utils.get_color(Utils.WHITE)))
+            self.hud_texts[name] = cached
+        return cached[1]
 
-        stage_text = self.font.render('Stage ' + str(self.current_stage + 1), False, Utils.get_color(Utils.WHITE))
-        self.screen.blit(stage_text, (self.screen_size/2 - stage_text.get_width()/2, stage_text.get_height()/1.3))
+    def __draw_score(self):
+        # Returns the rectangles covered by the texts
+        total_score = self.__hud_text("total_score", 'Score:' + str(self.total_score))
+        p1_score = self.__hud_text("p1_score", 'P1:' + str(self.total_score_p1))
+        p2_score = self.__hud_text("p2_score", 'P2:' + str(self.total_score_p2))
+        stage_text = self.__hud_text("stage", 'Stage ' + str(self.current_stage + 1))
+        return self.screen.blits([
+            (total_score, (self.screen_size/2 - total_score.get_width()/2,
+                           self.screen_size-self.tile_size + total_score.get_height()/1.3)),
+            (p1_score, (10, self.screen_size-self.tile_size + p1_score.get_height()/1.3)),
+            (p2_score, (self.screen_size - p2_score.get_width() - 10,
+                        self.screen_size-self.tile_size + p2_score.get_height()/1.3)),
+            (stage_text, (self.screen_size/2 - stage_text.get_width()/2, stage_text.get_height()/1.3))
+        ])
 
     def __fire_bullet(self, tank, is_enemy):
         if tank.is_terminate:
             return True
         current_time = self.frames_count
-        if tank is self.player1:
-            owner = GlobalConstants.PLAYER_1_OWNER
-        elif self.two_players and tank is self.player2:
-            owner = GlobalConstants.PLAYER_2_OWNER
-        else:
+        # Bullets of the players are owned by the index of the player
+        if is_enemy:
             owner = GlobalConstants.ENEMY_OWNER
+        else:
+            owner = self.player_tanks.index(tank)
         if current_time - tank.fire_started_time > tank.loading_time:
             tank.fire_started_time = self.frames_count
-            bullet = BulletSprite(size=self.rc_manager.bullet_size,
-                                  tile_size=self.tile_size,
+            bullet = BulletSprite(size=self.bullet_size,
+                                  tile_size=self.logic_tile_size,
                                   direction=tank.direction,
                                   speed=self.bullet_speed,
                                   pos_x=tank.target_x,
@@ -291,124 +416,136 @@ class TankBattle(object):
         if self.player1_human_control and self.player2_human_control:
             if self.two_players:
                 if key == pygame.K_LEFT:
-                    self.player1.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.LEFT_ACTION)
                 if key == pygame.K_RIGHT:
-                    self.player1.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.RIGHT_ACTION)
                 if key == pygame.K_UP:
-                    self.player1.move(GlobalConstants.UP_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.UP_ACTION)
                 if key == pygame.K_DOWN:
-                    self.player1.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.DOWN_ACTION)
                 if key == pygame.K_KP_ENTER:
-                    self.__fire_bullet(self.player1, False)
+                    self.apply_command(0, GlobalConstants.FIRE_ACTION)
                 if key == pygame.K_a:
-                    self.player2.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.LEFT_ACTION)
                 if key == pygame.K_d:
-                    self.player2.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.RIGHT_ACTION)
                 if key == pygame.K_w:
-                    self.player2.move(GlobalConstants.UP_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.UP_ACTION)
                 if key == pygame.K_s:
-                    self.player2.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.DOWN_ACTION)
                 if key == pygame.K_SPACE:
-                    self.__fire_bullet(self.player2, False)
+                    self.apply_command(1, GlobalConstants.FIRE_ACTION)
             else:
                 if key == pygame.K_LEFT:
-                    self.player1.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.LEFT_ACTION)
                 if key == pygame.K_RIGHT:
-                    self.player1.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.RIGHT_ACTION)
                 if key == pygame.K_UP:
-                    self.player1.move(GlobalConstants.UP_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.UP_ACTION)
                 if key == pygame.K_DOWN:
-                    self.player1.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.DOWN_ACTION)
                 if key == pygame.K_SPACE:
-                    self.__fire_bullet(self.player1, False)
+                    self.apply_command(0, GlobalConstants.FIRE_ACTION)
         else:
             if not self.player1_human_control:
                 if self.two_players:
                     if key == pygame.K_LEFT:
-                        self.player2.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.LEFT_ACTION)
                     if key == pygame.K_RIGHT:
-                        self.player2.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.RIGHT_ACTION)
                     if key == pygame.K_UP:
-                        self.player2.move(GlobalConstants.UP_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.UP_ACTION)
                     if key == pygame.K_DOWN:
-                        self.player2.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.DOWN_ACTION)
                     if key == pygame.K_SPACE:
-                        self.__fire_bullet(self.player2, False)
+                        self.apply_command(1, GlobalConstants.FIRE_ACTION)
             else:
                 if key == pygame.K_LEFT:
-                    self.player1.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.LEFT_ACTION)
                 if key == pygame.K_RIGHT:
-                    self.player1.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.RIGHT_ACTION)
                 if key == pygame.K_UP:
-                    self.player1.move(GlobalConstants.UP_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.UP_ACTION)
                 if key == pygame.K_DOWN:
-                    self.player1.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.DOWN_ACTION)
                 if key == pygame.K_SPACE:
-                    self.__fire_bullet(self.player1, False)
+                    self.apply_command(0, GlobalConstants.FIRE_ACTION)
 
     def __joystick_control(self):
         if self.player1_human_control and self.player2_human_control:
             if self.two_players:
                 if self.joystick_p1 is not None:
                     if self.joystick_p1.get_axis(0) < 0:
-                        self.player1.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.LEFT_ACTION)
                     if self.joystick_p1.get_axis(0) > 0:
-                        self.player1.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.RIGHT_ACTION)
                     if self.joystick_p1.get_axis(1) < 0:
-                        self.player1.move(GlobalConstants.UP_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.UP_ACTION)
                     if self.joystick_p1.get_axis(1) > 0:
-                        self.player1.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.DOWN_ACTION)
                     if self.joystick_p1.get_button(0) > 0 or self.joystick_p1.get_button(1) > 0:
-                        self.__fire_bullet(self.player1, False)
+                        self.apply_command(0, GlobalConstants.FIRE_ACTION)
                 if self.joystick_p2 is not None:
                     if self.joystick_p2.get_axis(0) < 0:
-                        self.player2.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.LEFT_ACTION)
                     if self.joystick_p2.get_axis(0) > 0:
-                        self.player2.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.RIGHT_ACTION)
                     if self.joystick_p2.get_axis(1) < 0:
-                        self.player2.move(GlobalConstants.UP_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.UP_ACTION)
                     if self.joystick_p2.get_axis(1) > 0:
-                        self.player2.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                        self.apply_command(1, GlobalConstants.DOWN_ACTION)
                     if self.joystick_p2.get_button(0) > 0 or self.joystick_p2.get_button(1) > 0:
-                        self.__fire_bullet(self.player2, False)
+                        self.apply_command(1, GlobalConstants.FIRE_ACTION)
             else:
                 if self.joystick_p1 is not None:
                     if self.joystick_p1.get_axis(0) < 0:
-                        self.player1.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.LEFT_ACTION)
                     if self.joystick_p1.get_axis(0) > 0:
-                        self.player1.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.RIGHT_ACTION)
                     if self.joystick_p1.get_axis(1) < 0:
-                        self.player1.move(GlobalConstants.UP_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.UP_ACTION)
                     if self.joystick_p1.get_axis(1) > 0:
-                        self.player1.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.DOWN_ACTION)
                     if self.joystick_p1.get_button(0) > 0 or self.joystick_p1.get_button(1) > 0:
-                        self.__fire_bullet(self.player1, False)
+                        self.apply_command(0, GlobalConstants.FIRE_ACTION)
         else:
             if not self.player1_human_control:
                 if self.two_players:
                     if self.joystick_p2 is not None:
                         if self.joystick_p2.get_axis(0) < 0:
-                            self.player2.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                            self.apply_command(1, GlobalConstants.LEFT_ACTION)
                         if self.joystick_p2.get_axis(0) > 0:
-                            self.player2.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                            self.apply_command(1, GlobalConstants.RIGHT_ACTION)
                         if self.joystick_p2.get_axis(1) < 0:
-                            self.player2.move(GlobalConstants.UP_ACTION, self.sprites)
+                            self.apply_command(1, GlobalConstants.UP_ACTION)
                         if self.joystick_p2.get_axis(1) > 0:
-                            self.player2.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                            self.apply_command(1, GlobalConstants.DOWN_ACTION)
                         if self.joystick_p2.get_button(0) > 0 or self.joystick_p2.get_button(1) > 0:
-                            self.__fire_bullet(self.player2, False)
+                            self.apply_command(1, GlobalConstants.FIRE_ACTION)
             else:
                 if self.joystick_p1 is not None:
                     if self.joystick_p1.get_axis(0) < 0:
-                        self.player1.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.LEFT_ACTION)
                     if self.joystick_p1.get_axis(0) > 0:
-                        self.player1.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.RIGHT_ACTION)
                     if self.joystick_p1.get_axis(1) < 0:
-                        self.player1.move(GlobalConstants.UP_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.UP_ACTION)
                     if self.joystick_p1.get_axis(1) > 0:
-                        self.player1.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                        self.apply_command(0, GlobalConstants.DOWN_ACTION)
                     if self.joystick_p1.get_button(0) > 0 or self.joystick_p1.get_button(1) > 0:
-                        self.__fire_bullet(self.player1, False)
+                        self.apply_command(0, GlobalConstants.FIRE_ACTION)
+
+    def apply_command(self, player, action):
+        # Every move or fire of a player (0 for player 1), from agents or humans, goes through here
+        if action < 0:
+            return
+        tank = self.player_tanks[player]
+        if action == GlobalConstants.FIRE_ACTION:
+            self.__fire_bullet(tank, False)
+        else:
+            tank.move(action)
+        if self.recorder is not None:
+            self.recorder.add_command(player, action)
 
     def __handle_event(self):
 
@@ -430,18 +567,15 @@ class TankBattle(object):
         return True
 
     def __check_reward(self):
-        p1_score = 0
-        if len(self.next_rewards_p1) > 0:
-            p1_score = self.next_rewards_p1[0]
-            self.next_rewards_p1.popleft()
-        p2_score = 0
-        if len(self.next_rewards_p2) > 0:
-            p2_score = self.next_rewards_p2[0]
-            self.next_rewards_p2.popleft()
-        return [p1_score, p2_score]
+        # Kills are rewarded one per step and player
+        rewards = [0] * self.num_of_players
+        for i, next_rewards in enumerate(self.next_rewards):
+            if len(next_rewards) > 0:
+                rewards[i] = next_rewards.popleft()
+        return rewards
 
     def __generate_explosion(self, abs_x, abs_y):
-        expl = ExplosionSprite(self.tile_size, abs_x, abs_y, 2,
+        expl = ExplosionSprite(self.logic_tile_size, abs_x, abs_y, 2,
                                [self.rc_manager.get_image(ResourceManager.EXPLOSION_1),
                                 self.rc_manager.get_image(ResourceManager.EXPLOSION_2),
                                 self.rc_manager.get_image(ResourceManager.EXPLOSION_3)])
@@ -455,11 +589,16 @@ class TankBattle(object):
                 self.booms.remove(expl)
 
     def __bullets_update(self):
+        # Bucket sprites by tile so that each bullet only tests its neighbours (walls are bucketed once per stage)
+        self.enemies_hash.invalidate()
+        self.bullets_player_hash.invalidate()
+        self.bullets_enemy_hash.invalidate()
+
         for bullet in self.bullets_player:
             is_hit = False
 
             # Check if it hits other enemy's bullets
-            bullets_hit = pygame.sprite.spritecollide(bullet, self.bullets_enemy, True)
+            bullets_hit = self.bullets_enemy_hash.collide(bullet, True)
             for bullet_enemy in bullets_hit:
                 self.bullets_enemy.remove(bullet_enemy)
                 self.sprites.remove(bullet_enemy)
@@ -471,20 +610,17 @@ class TankBattle(object):
                 continue
 
             # Check if it hits the enemy
-            enemies_hit = pygame.sprite.spritecollide(bullet, self.enemies, True)
+            enemies_hit = self.enemies_hash.collide(bullet, True)
             for enemy in enemies_hit:
                 self.__generate_explosion(enemy.rect.x, enemy.rect.y)
                 self.enemies.remove(enemy)
                 self.sprites.remove(enemy)
+                self.enemy_pool.append(enemy)
                 self.sprites.remove(bullet)
                 self.bullets_player.remove(bullet)
                 self.total_score = self.total_score + 10
-                if bullet.owner == GlobalConstants.PLAYER_1_OWNER:
-                    self.total_score_p1 = self.total_score_p1 + 10
-                    self.next_rewards_p1.append(10)
-                else:
-                    self.total_score_p2 = self.total_score_p2 + 10
-                    self.next_rewards_p2.append(10)
+                self.player_scores[bullet.owner] = self.player_scores[bullet.owner] + 10
+                self.next_rewards[bullet.owner].append(10)
                 self.__generate_enemies(1)
                 is_hit = True
                 break
@@ -511,17 +647,21 @@ class TankBattle(object):
                 self.__generate_explosion(base.rect.x, base.rect.y)
                 self.bases.remove(base)
                 self.sprites.remove(base)
+                self.occupancy.remove(base.pos_x, base.pos_y)
+                self.__static_changed(base)
                 self.sprites.remove(bullet)
                 self.bullets_player.remove(bullet)
                 self.end_of_game = True
                 return
 
             # Check if it hits the wall -> remove the bullet
-            walls_hit = pygame.sprite.spritecollide(bullet, self.walls, False)
+            walls_hit = self.walls_hash.collide(bullet, False)
             for wall in walls_hit:
                 if wall.type == GlobalConstants.SOFT_OBJECT:
                     self.sprites.remove(wall)
                     self.walls.remove(wall)
+                    self.occupancy.remove(wall.pos_x, wall.pos_y)
+                    self.__static_changed(wall)
                 if wall.type != GlobalConstants.TRANSPARENT_OBJECT:
                     self.sprites.remove(bullet)
                     self.bullets_player.remove(bullet)
@@ -530,7 +670,7 @@ class TankBattle(object):
             is_hit = False
 
             # Check if it hits other player's bullets
-            bullets_hit = pygame.sprite.spritecollide(bullet, self.bullets_player, True)
+            bullets_hit = self.bullets_player_hash.collide(bullet, True)
             for bullet_player in bullets_hit:
                 self.bullets_player.remove(bullet_player)
                 self.sprites.remove(bullet_player)
@@ -564,119 +704,461 @@ class TankBattle(object):
                 self.__generate_explosion(base.rect.x, base.rect.y)
                 self.bases.remove(base)
                 self.sprites.remove(base)
+                self.occupancy.remove(base.pos_x, base.pos_y)
+                self.__static_changed(base)
                 self.sprites.remove(bullet)
                 self.bullets_enemy.remove(bullet)
                 self.end_of_game = True
                 return
 
             # Check if it hits the wall -> remove the bullet
-            walls_hit = pygame.sprite.spritecollide(bullet, self.walls, False)
+            walls_hit = self.walls_hash.collide(bullet, False)
             for wall in walls_hit:
                 if wall.type == GlobalConstants.SOFT_OBJECT:
                     self.sprites.remove(wall)
                     self.walls.remove(wall)
+                    self.occupancy.remove(wall.pos_x, wall.pos_y)
+                    self.__static_changed(wall)
                 if wall.type != GlobalConstants.TRANSPARENT_OBJECT:
                     self.sprites.remove(bullet)
                     self.bullets_enemy.remove(bullet)
 
-    def __calculate_fps(self):
+    def __count_frame(self):
         self.frames_count = self.frames_count + 1
         if self.max_frames > 0:
             if self.frames_count > self.max_frames:
                 self.end_of_game = True
-        current_time = Utils.get_current_time()
-        if current_time > self.started_time:
-            self.frame_speed = self.frames_count / (current_time - self.started_time)
+        if self.metrics.add_frame():
+            self.metrics.emit(Metrics.FRAME_EVENT, self.get_info())
+
+    @property
+    def frame_speed(self):
+        return self.metrics.get_stats()["fps_window"]
+
+    def get_info(self):
+        info = {
+            "players_bullets": len(self.bullets_player),
+            "enemies_bullets": len(self.bullets_enemy),
+            "frame": self.frames_count,
+            "score_p1": self.total_score_p1,
+            "score_p2": self.total_score_p2,
+            "total_score": self.total_score,
+            "players_left": len(self.players)
+        }
+        info.update(self.metrics.get_stats())
+        return info
+
+    def __draw(self):
+        prof = self.profiler
+        if prof is not None:
+            started = prof.start()
+
+        if self.screen is None:
+            self.screen, self.state_view = Utils.create_canvas(self.screen_size, self.screen_size)
+            self.background = None
+
+        # Restore the background where the previous frame drew, then draw the moving sprites in group order
+        # (walls and base always precede them in the group)
+        erased = self.__update_background()
+        if self.dirty_rects is None:
+            self.screen.blit(self.background, (0, 0))
         else:
-            self.frame_speed = 0
+            self.screen.blits([(self.background, rect, rect) for rect in self.dirty_rects + erased], False)
+        static = self.background_sprites
+        drawn = self.screen.blits([(sprite.image, self.__screen_pos(sprite)) for sprite in self.sprites
+                                   if sprite not in static])
 
-    def __print_info(self):
-        if self.is_debug:
-            if self.frames_count % self.log_freq == 0:
-                print("Number of players' bullets:", len(self.bullets_player))
-                print("Number of enemies' bullets:", len(self.bullets_enemy))
-                print("Current frame:", self.frames_count)
-                print("Player 1 score:", self.total_score_p1)
-                print("Player 2 score:", self.total_score_p2)
-                print("Total score:", self.total_score)
-                print("Number of players left", len(self.players))
-                print("Frame speed (FPS):", self.frame_speed)
-                print("")
+        if prof is not None:
+            prof.stop("draw_sprites", started)
+            started = prof.start()
+
+        # Draw score
+        if self.show_hud:
+            drawn.extend(self.__draw_score())
+
+        if prof is not None:
+            prof.stop("draw_score", started)
+
+        # The window is updated with the changed rectangles only
+        if self.rd and self.display_rects is not None:
+            if self.dirty_rects is None:
+                self.display_rects = None
+            else:
+                self.display_rects.extend(self.dirty_rects + erased + drawn)
+        self.dirty_rects = drawn
+        self.is_dirty = False
+
+    def __screen_pos(self, sprite):
+        # Sprites live in logic units, scaled to screen pixels when tiles are drawn at another size
+        if self.tile_size == self.logic_tile_size:
+            return sprite.rect.topleft
+        return (sprite.rect.x * self.tile_size // self.logic_tile_size,
+                sprite.rect.y * self.tile_size // self.logic_tile_size)
+
+    def __update_background(self):
+        # Walls and base destroyed since the last frame are erased from the background and their rectangles
+        # returned. A new stage or a restored snapshot redraws the whole background (and then the whole screen)
+        if self.background is None or self.background_sprites is None:
+            if self.background is None:
+                self.background = self.screen.copy()
+            self.background.fill(Utils.get_color(Utils.BLACK))
+            static = [sprite for sprite in self.sprites if sprite in self.static_sprites]
+            self.background.blits([(sprite.image, self.__screen_pos(sprite)) for sprite in static], False)
+            self.background_sprites = set(static)
+            self.dirty_rects = None
+            return []
+        if len(self.background_sprites) == len(self.walls) + len(self.bases):
+            return []
+        erased = []
+        for sprite in [sprite for sprite in self.background_sprites if not sprite.alive()]:
+            rect = sprite.image.get_rect(topleft=self.__screen_pos(sprite))
+            self.background.fill(Utils.get_color(Utils.BLACK), rect)
+            self.background_sprites.remove(sprite)
+            erased.append(rect)
+        return erased
 
     def __render(self):
+        # Phases are timed only when a profiler is set (see set_profiler)
+        prof = self.profiler
+        if prof is not None:
+            started = prof.start()
 
         # Handle user event
         if self.rd:
             self.__handle_event()
+            if prof is not None:
+                prof.stop("events", started)
+                started = prof.start()
 
-        # Draw background first
-        self.screen.fill(Utils.get_color(Utils.BLACK))
+        # Remove explosions finished in the previous frame (after they have been drawn)
+        self.__remove_explosions()
+
+        if prof is not None:
+            prof.stop("explosions", started)
+            prof.count("sprites", len(self.sprites))
+            started = prof.start()
+
+        # Update moving sprites, walls and base never change by themselves
+        self.players.update()
+        self.enemies.update()
+        self.bullets_player.update()
+        self.bullets_enemy.update()
+        self.booms.update()
 
-        # Update sprites
-        self.sprites.update()
+        if prof is not None:
+            prof.stop("sprites_update", started)
+            started = prof.start()
 
         # Update enemies
         self.__enemies_update()
 
+        if prof is not None:
+            prof.stop("enemies_update", started)
+            prof.count("enemies", len(self.enemies))
+            prof.count("bullets", len(self.bullets_player) + len(self.bullets_enemy))
+            hashes = (self.walls_hash, self.enemies_hash, self.bullets_player_hash, self.bullets_enemy_hash)
+            tests = sum(h.num_of_tests for h in hashes)
+            started = prof.start()
+
         # Update bullets
         self.__bullets_update()
 
-        # Redraw all sprites
-        self.sprites.draw(self.screen)
+        if prof is not None:
+            prof.stop("bullets_update", started)
+            prof.count("collision_tests", sum(h.num_of_tests for h in hashes) - tests)
 
-        # Draw score
-        self.__draw_score()
+        if self.rd:
+            self.__draw()
 
-        # Remove all explosions
-        self.__remove_explosions()
+            if prof is not None:
+                started = prof.start()
 
-        # Show to the screen what we're have drawn so far
-        if self.rd:
-            pygame.display.flip()
+            # Show to the screen what we're have drawn so far
+            if self.display_rects is None:
+                self.display.blit(self.screen, (0, 0))
+                pygame.display.flip()
+            else:
+                self.display.blits([(self.screen, rect, rect) for rect in self.display_rects], False)
+                pygame.display.update(self.display_rects)
+            self.display_rects = []
+
+            if prof is not None:
+                prof.stop("display", started)
+                started = prof.start()
 
-        # Maintain 20 fps
-        pygame.time.Clock().tick(self.speed)
+            # Maintain the frame rate
+            self.clock.tick(self.speed)
 
-        # Calculate fps
-        self.__calculate_fps()
+            if prof is not None:
+                prof.stop("tick", started)
+        else:
+            # Headless mode: the surface is only drawn when get_state() asks for it
+            self.is_dirty = True
+
+        # Count the frame and report it to the metrics sinks
+        self.__count_frame()
+
+        if self.recorder is not None:
+            self.recorder.end_frame(self)
 
-        # Debug
-        self.__print_info()
+        if prof is not None:
+            prof.end_frame()
+
+    def set_profiler(self, profiler):
+        # A Profiler collects per phase timings and counters of every frame, None disables profiling
+        self.profiler = profiler
 
     def set_seed(self, seed):
         self.seed = seed
+        self.rng = np.random.default_rng(seed)
+
+    def set_recorder(self, recorder):
+        # The recorder (see EpisodeRecorder) starts with the current frame and follows the next episodes
+        if self.recorder is not None:
+            self.recorder.end_episode()
+        self.recorder = recorder
+        if recorder is not None:
+            recorder.begin_episode(self)
 
     def reset(self):
+        started = self.metrics.begin_reset()
+        if self.recorder is not None:
+            self.recorder.end_episode()
+        if len(self.metrics.sinks) > 0:
+            summary = {"episode_frames": self.frames_count, "total_score": self.total_score,
+                       "score_p1": self.total_score_p1, "score_p2": self.total_score_p2}
         self.end_of_game = False
         self.frames_count = 0
         self.enemy_speed = GlobalConstants.ENEMY_SPEED
         self.enemy_bullet_loading_time = GlobalConstants.ENEMY_LOADING_TIME
-        self.started_time = Utils.get_current_time()
 
-        for sprite in self.sprites:
-            sprite.kill()
-
-        self.__generate_base_and_walls()
+        # The game restarts from its pristine stage: destroyed walls and base are added back (a new stage is
+        # built instead), then the tanks are respawned and the enemies spawned with new random draws
+        self.enemy_pool.extend(self.enemies)
+        for group in (self.players, self.enemies, self.bullets_player, self.bullets_enemy, self.booms):
+            for sprite in group:
+                sprite.kill()
+        self.enemies_hash.invalidate()
+        self.pending_enemies = 0
+
+        stage, tiles = self.current_stage, self.stage_map.get_grid(self.current_stage)
+        self.__select_stage()
+        if self.current_stage != stage or self.stage_map.get_grid(stage) is not tiles:
+            self.__build_stage()
+        elif len(self.walls) != len(self.stage_walls) or not self.bases.has_internal(self.base):
+            self.__restore_static_objects(range(len(self.stage_walls)), True)
+        self.occupancy.cells[:] = self.static_occupancy
         self.__generate_players()
         self.__generate_enemies(self.num_of_enemies)
 
-        self.stage_map.load_map(self.current_stage)
-
-        if self.is_debug:
-            interval = Utils.get_current_time() - self.started_time
-            print("#################  RESET GAME  ##################")
-            print("Episode terminated after:", interval, "(s)")
-            print("Total score:", self.total_score)
-            print("Player 1 score:", self.total_score_p1)
-            print("Player 2 score:", self.total_score_p2)
-            print("#################################################")
-
         self.total_score = 0
-        self.total_score_p1 = 0
-        self.total_score_p2 = 0
+        self.player_scores = [0] * self.num_of_players
 
         self.__render()
 
+        if self.recorder is not None:
+            self.recorder.begin_episode(self)
+
+        # The first frame of the new episode is part of the reset latency
+        self.metrics.end_reset(started)
+        if len(self.metrics.sinks) > 0:
+            summary.update(self.metrics.get_stats())
+            self.metrics.emit(Metrics.RESET_EVENT, summary)
+
+    @staticmethod
+    def __save_tank(tank):
+        return (tank.pos_x, tank.pos_y, tank.target_x, tank.target_y, tank.rect.x, tank.rect.y, tank.direction,
+                tank.sprite_bg.index(tank.image), tank.fire_started_time, tank.loading_time, tank.speed,
+                tank.is_terminate)
+
+    def __restore_tank(self, data, sprite_bg, is_enemy, auto_control, tank=None):
+        # The snapshot data is written into tank, or into a new tank if None
+        pos_x, pos_y, target_x, target_y, x, y, direction, image, fire_started_time, loading_time, speed, \
+            is_terminate = data
+        if tank is None:
+            tank = TankSprite(self.logic_tile_size, pos_x=pos_x, pos_y=pos_y, sprite_bg=sprite_bg,
+                              is_enemy=is_enemy, bullet_loading_time=loading_time, speed=speed,
+                              auto_control=auto_control, occupancy=self.occupancy)
+        else:
+            tank.respawn(pos_x, pos_y, direction, loading_time, speed)
+        tank.target_x = target_x
+        tank.target_y = target_y
+        if target_x != pos_x or target_y != pos_y:
+            self.occupancy.add(target_x, target_y)
+        tank.rect.x = x
+        tank.rect.y = y
+        tank.direction = direction
+        tank.image = tank.sprite_bg[image]
+        tank.fire_started_time = fire_started_time
+        if is_terminate:
+            tank.kill()
+        return tank
+
+    def save_state(self):
+        # Plain data snapshot of the current game (picklable). Walls and the base can only be destroyed during a
+        # game, so only the indices of the remaining ones are stored. Moving sprites are listed in drawing order,
+        # which is also the order of their own groups, so that a restored game replays exactly the same way
+        players = self.player_tanks
+        entries = []
+        for sprite in self.sprites:
+            if sprite in self.static_sprites:
+                continue
+            if sprite in players:
+                entries.append(("player", players.index(sprite)))
+            elif sprite.type == GlobalConstants.BULLET_OBJECT:
+                entries.append(("bullet", self.bullets_enemy.has_internal(sprite), sprite.owner, sprite.direction,
+                                sprite.pos_x, sprite.pos_y, sprite.rect.x, sprite.rect.y))
+            elif sprite.type == GlobalConstants.EXPLOSION_OBJECT:
+                entries.append(("explosion", sprite.rect.x, sprite.rect.y, sprite.count, sprite.current_frame))
+            else:
+                entries.append(("enemy", self.__save_tank(sprite)))
+        return {
+            "stage": self.current_stage,
+            "tiles": self.stage_map.get_grid(self.current_stage),
+            "walls": tuple(i for i, wall in enumerate(self.stage_walls) if self.walls.has_internal(wall)),
+            "base": self.bases.has_internal(self.base),
+            "occupancy": self.occupancy.cells.copy(),
+            "frames_count": self.frames_count,
+            "end_of_game": self.end_of_game,
+            "total_score": self.total_score,
+            "player_scores": tuple(self.player_scores),
+            "enemy_speed": self.enemy_speed,
+            "enemy_bullet_loading_time": self.enemy_bullet_loading_time,
+            "pending_enemies": self.pending_enemies,
+            "next_rewards": [tuple(next_rewards) for next_rewards in self.next_rewards],
+            "players": [self.__save_tank(player) for player in players],
+            "sprites": entries,
+            "random_state": self.rng.bit_generator.state
+        }
+
+    def __restore_static_objects(self, walls, has_base):
+        # Only the walls and base that differ from the snapshot are killed or added back. The moving sprites have
+        # been removed, so added ones are put after the remaining ones and still precede them in the groups (the
+        # order of walls and base does not matter). Added ones are drawn again on the cached background
+        expected = [False] * len(self.stage_walls)
+        for i in walls:
+            expected[i] = True
+        restored = []
+        for wall, is_expected in zip(self.stage_walls, expected):
+            if self.walls.has_internal(wall) != is_expected:
+                if is_expected:
+                    restored.append(wall)
+                else:
+                    wall.kill()
+                    self.__static_changed(wall)
+        self.walls.add(restored)
+        if self.bases.has_internal(self.base) != has_base:
+            if has_base:
+                self.bases.add(self.base)
+                restored.append(self.base)
+            else:
+                self.base.kill()
+                self.__static_changed(self.base)
+        if len(restored) == 0:
+            return
+        self.sprites.add(restored)
+        self.walls_hash.invalidate()
+        for sprite in restored:
+            self.__static_changed(sprite)
+        if self.background_sprites is not None:
+            rects = []
+            for sprite in restored:
+                if sprite not in self.background_sprites:
+                    rects.append(self.background.blit(sprite.image, self.__screen_pos(sprite)))
+                    self.background_sprites.add(sprite)
+            if self.dirty_rects is not None:
+                self.dirty_rects.extend(rects)
+
+    def __load_stage(self, stage, tiles):
+        # Rebuilds walls and base for a snapshot taken on another stage (stage tiles are never modified in place)
+        self.current_stage = stage
+        self.stage_map.set_stage(stage, tiles)
+        self.__build_stage()
+
+    def restore_state(self, state):
+        # Moving sprites of the current game are overwritten with the snapshot, new ones are only created when
+        # the snapshot has more of them
+        self.enemy_pool.extend(self.enemies)
+        bullets = self.bullets_player.sprites() + self.bullets_enemy.sprites()
+        booms = self.booms.sprites()
+        # The occupancy is restored from the snapshot, tanks do not release their tiles
+        for group in (self.players, self.enemies, self.bullets_player, self.bullets_enemy, self.booms):
+            for sprite in group:
+                pygame.sprite.Sprite.kill(sprite)
+        tiles = state["tiles"]
+        current = self.stage_map.get_grid(self.current_stage)
+        if state["stage"] != self.current_stage or (tiles is not current and not np.array_equal(tiles, current)):
+            self.__load_stage(state["stage"], tiles)
+        self.__restore_static_objects(state["walls"], state["base"])
+
+        rc = self.rc_manager
+        if len(state["players"]) != self.num_of_players:
+            raise ValueError("Invalid parameter ! The state has " + str(len(state["players"])) + " players")
+        players = [self.__restore_tank(data, None, False, True, player)
+                   for player, data in zip(self.player_tanks, state["players"])]
+        enemy_bg = rc.get_tank_images(None)
+        explosion_bg = [rc.get_image(ResourceManager.EXPLOSION_1), rc.get_image(ResourceManager.EXPLOSION_2),
+                        rc.get_image(ResourceManager.EXPLOSION_3)]
+
+        for entry in state["sprites"]:
+            kind = entry[0]
+            if kind == "player":
+                self.sprites.add(players[entry[1]])
+                self.players.add(players[entry[1]])
+            elif kind == "enemy":
+                pooled = self.enemy_pool.pop() if len(self.enemy_pool) > 0 else None
+                enemy = self.__restore_tank(entry[1], enemy_bg, True, True, pooled)
+                self.sprites.add(enemy)
+                self.enemies.add(enemy)
+            elif kind == "bullet":
+                is_enemy, owner, direction, pos_x, pos_y, x, y = entry[1:]
+                if len(bullets) > 0:
+                    bullet = bullets.pop()
+                    bullet.direction = direction
+                    bullet.pos_x = pos_x
+                    bullet.pos_y = pos_y
+                    bullet.owner = owner
+                else:
+                    bullet = BulletSprite(size=self.bullet_size, tile_size=self.logic_tile_size,
+                                          direction=direction, speed=self.bullet_speed, pos_x=pos_x, pos_y=pos_y,
+                                          owner=owner, sprite_bg=rc.get_image(ResourceManager.BULLET))
+                bullet.rect.x = x
+                bullet.rect.y = y
+                self.sprites.add(bullet)
+                if is_enemy:
+                    self.bullets_enemy.add(bullet)
+                else:
+                    self.bullets_player.add(bullet)
+            else:
+                x, y, count, current_frame = entry[1:]
+                if len(booms) > 0:
+                    expl = booms.pop()
+                    expl.rect.x = x
+                    expl.rect.y = y
+                else:
+                    expl = ExplosionSprite(self.logic_tile_size, x, y, 2, explosion_bg)
+                expl.count = count
+                expl.current_frame = current_frame
+                expl.image = explosion_bg[max(current_frame - 1, 0)]
+                self.sprites.add(expl)
+                self.booms.add(expl)
+
+        # Tanks have updated the occupancy while being recreated, reused enemies may still be in the buckets
+        self.occupancy.cells[:] = state["occupancy"]
+        self.enemies_hash.invalidate()
+        self.frames_count = state["frames_count"]
+        self.end_of_game = state["end_of_game"]
+        self.total_score = state["total_score"]
+        self.player_scores = list(state["player_scores"])
+        self.enemy_speed = state["enemy_speed"]
+        self.enemy_bullet_loading_time = state["enemy_bullet_loading_time"]
+        self.pending_enemies = state["pending_enemies"]
+        for next_rewards, saved in zip(self.next_rewards, state["next_rewards"]):
+            next_rewards.clear()
+            next_rewards.extend(saved)
+        self.rng.bit_generator.state = state["random_state"]
+        self.is_dirty = True
+
     def step(self, action, action_p2=-1):
         if self.player1_human_control and self.player2_human_control:
             raise ValueError("Error: human control mode")
@@ -684,59 +1166,69 @@ class TankBattle(object):
         if not self.player1_human_control and not self.player2_human_control:
             if self.two_players:
                 if action == GlobalConstants.P1_LEFT_ACTION:
-                    self.player1.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.LEFT_ACTION)
                 elif action == GlobalConstants.P1_RIGHT_ACTION:
-                    self.player1.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.RIGHT_ACTION)
                 elif action == GlobalConstants.P1_UP_ACTION:
-                    self.player1.move(GlobalConstants.UP_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.UP_ACTION)
                 elif action == GlobalConstants.P1_DOWN_ACTION:
-                    self.player1.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                    self.apply_command(0, GlobalConstants.DOWN_ACTION)
                 elif action == GlobalConstants.P1_FIRE_ACTION:
-                    self.__fire_bullet(self.player1, False)
+                    self.apply_command(0, GlobalConstants.FIRE_ACTION)
 
                 if action_p2 == GlobalConstants.P2_LEFT_ACTION:
-                    self.player2.move(GlobalConstants.LEFT_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.LEFT_ACTION)
                 elif action_p2 == GlobalConstants.P2_RIGHT_ACTION:
-                    self.player2.move(GlobalConstants.RIGHT_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.RIGHT_ACTION)
                 elif action_p2 == GlobalConstants.P2_UP_ACTION:
-                    self.player2.move(GlobalConstants.UP_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.UP_ACTION)
                 elif action_p2 == GlobalConstants.P2_DOWN_ACTION:
-                    self.player2.move(GlobalConstants.DOWN_ACTION, self.sprites)
+                    self.apply_command(1, GlobalConstants.DOWN_ACTION)
                 elif action_p2 == GlobalConstants.P2_FIRE_ACTION:
-                    self.__fire_bullet(self.player2, False)
+                    self.apply_command(1, GlobalConstants.FIRE_ACTION)
                 players.append(GlobalConstants.PLAYER_1_OWNER)
                 players.append(GlobalConstants.PLAYER_2_OWNER)
             else:
-                if action != GlobalConstants.FIRE_ACTION:
-                    self.player1.move(action, self.sprites)
-                else:
-                    self.__fire_bullet(self.player1, False)
+                self.apply_command(0, action)
                 players.append(GlobalConstants.PLAYER_1_OWNER)
         else:
             if not self.player1_human_control:
-                if action != GlobalConstants.FIRE_ACTION:
-                    self.player1.move(action, self.sprites)
-                else:
-                    self.__fire_bullet(self.player1, False)
+                self.apply_command(0, action)
                 players.append(GlobalConstants.PLAYER_1_OWNER)
             else:
                 if self.two_players:
-                    if action != GlobalConstants.FIRE_ACTION:
-                        self.player2.move(action, self.sprites)
-                    else:
-                        self.__fire_bullet(self.player2, False)
+                    self.apply_command(1, action)
                     players.append(GlobalConstants.PLAYER_2_OWNER)
                 else:
                     raise ValueError("Error: human control mode")
 
+        rewards = self.__frame_step()
+        if self.num_of_players == 1:
+            return [rewards[0], 0]
+        return rewards[:2]
+
+    def step_players(self, actions):
+        # One action per player (negative for no action), returns the rewards of all players.
+        # Human controlled players should be given no action
+        if len(actions) != self.num_of_players:
+            raise ValueError("Invalid parameter ! Expected " + str(self.num_of_players) + " actions")
+        for player, action in enumerate(actions):
+            self.apply_command(player, int(action))
+        return self.__frame_step()
+
+    def __frame_step(self):
         if self.frame_skip <= 1:
             self.__render()
         else:
             for _ in range(self.frame_skip):
                 self.__render()
 
+        self.metrics.add_step()
         return self.__check_reward()
 
+    def get_players_alive(self):
+        return [not tank.is_terminate for tank in self.player_tanks]
+
     def render(self):
         self.__render()
 
@@ -747,20 +1239,143 @@ class TankBattle(object):
         return next_state, r, terminal
 
     def get_state_space(self):
+        if self.state_mode == GlobalConstants.GRAY_STATE:
+            return [self.state_size, self.state_size]
+        if self.state_mode == GlobalConstants.GRID_STATE:
+            return [self.num_of_tiles, self.num_of_tiles, GlobalConstants.NUM_OF_GRID_PLANES]
         return [self.screen_size, self.screen_size]
 
     def get_action_space(self):
         return range(self.num_of_actions)
 
-    def get_state(self):
-        pygame.pixelcopy.surface_to_array(self.current_buffer, self.screen)
-        return self.current_buffer
+    def __static_changed(self, sprite):
+        # The grid state updates the tile of a wall or base destroyed or restored during the game
+        if self.static_grid is not None:
+            self.static_changes.append(sprite)
+
+    @staticmethod
+    def __static_plane(sprite):
+        if sprite.type == GlobalConstants.SOFT_OBJECT:
+            return GlobalConstants.GRID_SOFT_WALL
+        if sprite.type == GlobalConstants.TRANSPARENT_OBJECT:
+            return GlobalConstants.GRID_SEA
+        if isinstance(sprite, BaseSprite):
+            return GlobalConstants.GRID_BASE
+        return GlobalConstants.GRID_HARD_WALL
+
+    def __static_grid(self):
+        # Persistent grid state: the planes of walls and base are built once per stage (or restored snapshot),
+        # then only the tiles of the walls and base destroyed or restored since the last state are updated
+        if self.static_grid is None:
+            grid = np.zeros((self.num_of_tiles, self.num_of_tiles, GlobalConstants.NUM_OF_GRID_PLANES),
+                            dtype=np.uint8)
+            for sprite in self.walls.sprites() + self.bases.sprites():
+                grid[sprite.pos_x, sprite.pos_y, TankBattle.__static_plane(sprite)] = 1
+            self.static_grid = grid
+            self.grid_tiles = ([], [])
+        else:
+            for sprite in self.static_changes:
+                self.static_grid[sprite.pos_x, sprite.pos_y, TankBattle.__static_plane(sprite)] = sprite.alive()
+        self.static_changes = []
+        return self.static_grid
+
+    def __grid_state(self, out):
+        # The moving sprites of the previous state are cleared from the persistent grid before drawing the new
+        # ones, then the whole grid is copied
+        grid = self.__static_grid()
+        xs, ys = self.grid_tiles
+        grid[xs, ys, GlobalConstants.GRID_BASE + 1:] = 0
+        xs, ys = [], []
+
+        # Tanks on the tile closest to their current position
+        half = int(self.logic_tile_size/2)
+        for tank in self.players.sprites() + self.enemies.sprites():
+            if tank is self.player_tanks[0]:
+                plane = GlobalConstants.GRID_PLAYER_1
+            elif tank.is_enemy:
+                plane = GlobalConstants.GRID_ENEMY
+            else:
+                plane = GlobalConstants.GRID_PLAYER_2
+            x = (tank.rect.x + half) // self.logic_tile_size
+            y = (tank.rect.y + half) // self.logic_tile_size
+            grid[x, y, plane] = tank.direction + 1
+            reload = tank.fire_started_time + tank.loading_time + 1 - self.frames_count
+            grid[x, y, GlobalConstants.GRID_RELOAD] = min(max(reload, 0), 255)
+            xs.append(x)
+            ys.append(y)
+
+        # Bullets on the tile of their centre
+        last = self.num_of_tiles - 1
+        for bullet in self.bullets_player.sprites() + self.bullets_enemy.sprites():
+            x = min(max(bullet.rect.centerx // self.logic_tile_size, 0), last)
+            y = min(max(bullet.rect.centery // self.logic_tile_size, 0), last)
+            grid[x, y, GlobalConstants.GRID_BULLET] = bullet.direction + 1
+            xs.append(x)
+            ys.append(y)
+        self.grid_tiles = (xs, ys)
+
+        if out is None:
+            return grid.copy()
+        out[:] = grid
+        return out
+
+    def get_state(self, mode=None, out=None, view=False):
+        # mode defaults to the state_mode of the game:
+        # - RGB_STATE: (screen_size, screen_size, 3) uint8 RGB state indexed [x, y]. With view=True a read-only
+        #   view of the screen is returned without copying; it is only valid until the next step
+        # - GRAY_STATE: (state_size, state_size) uint8 grayscale state indexed [x, y]
+        # - GRID_STATE: (num_of_tiles, num_of_tiles, NUM_OF_GRID_PLANES) uint8 tile planes indexed [x, y],
+        #   built from the sprites without drawing
+        # The state is written into out if given, otherwise into a new array owned by the caller
+        if mode is None:
+            mode = self.state_mode
+        if mode == GlobalConstants.GRID_STATE:
+            return self.__grid_state(out)
+        if self.is_dirty:
+            self.__draw()
+        if mode == GlobalConstants.GRAY_STATE:
+            return self.gray_state.process(self.screen, out)
+        if mode != GlobalConstants.RGB_STATE:
+            raise ValueError("Invalid parameter ! Unknown state mode: " + str(mode))
+        if view:
+            return self.state_view
+        if out is None:
+            out = np.empty(self.state_view.shape, dtype=np.uint8)
+        pygame.pixelcopy.surface_to_array(out, self.screen)
+        return out
+
+    def get_observations(self, mode=None, out=None):
+        # (num_of_players, ...) states of all players built in one pass. Grid states are centred on each player:
+        # GRID_PLAYER_1 holds the tank of the player itself and GRID_PLAYER_2 the tanks of the other players.
+        # Images are the same for every player
+        if mode is None:
+            mode = self.state_mode
+        if out is None:
+            state = self.get_state(mode=mode)
+            out = np.empty((self.num_of_players,) + state.shape, dtype=np.uint8)
+            out[0] = state
+        else:
+            self.get_state(mode=mode, out=out[0])
+        if self.num_of_players == 1:
+            return out
+        out[1:] = out[0]
+        if mode == GlobalConstants.GRID_STATE:
+            half = int(self.logic_tile_size/2)
+            tanks = [((tank.rect.x + half) // self.logic_tile_size, (tank.rect.y + half) // self.logic_tile_size,
+                      tank.direction + 1, i) for i, tank in enumerate(self.player_tanks) if not tank.is_terminate]
+            for player in range(1, self.num_of_players):
+                out[player, :, :, GlobalConstants.GRID_PLAYER_1] = 0
+                out[player, :, :, GlobalConstants.GRID_PLAYER_2] = 0
+                for x, y, direction, i in tanks:
+                    plane = GlobalConstants.GRID_PLAYER_1 if i == player else GlobalConstants.GRID_PLAYER_2
+                    out[player, x, y, plane] = direction
+        return out
 
     def is_terminal(self):
         return self.end_of_game
 
     def debug(self):
-        self.__print_info()
+        print_sink(Metrics.FRAME_EVENT, self.get_info())
 
     def get_num_of_actions(self):
         return self.num_of_actions
@@ -0,0 +1,154 @@
+import os
+import json
+import threading
+import queue
+import multiprocessing as mp
+import pygame
+from tankbattle.env.recorder import EpisodePlayer
+
+
+class RawVideoWriter(object):
+    # Frames are appended to one file as raw rgb24 (row-major), which has no header. The frame size and pixel format
+    # are written next to it in path + ".json", from which the ffmpeg command is built, e.g. for episode_0.rgb.json
+    # {"width": W, "height": H, "pix_fmt": "rgb24", ...}:
+    # ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH -r 60 -i episode_0.rgb episode_0.mp4
+    PIXEL_FORMAT = "rgb24"
+
+    def __init__(self, path):
+        self.path = path
+        self.header_path = path + ".json"
+        self.size = None
+        self.num_of_frames = 0
+        self.file = open(path, "wb")
+
+    def write(self, data, size):
+        if self.size is None:
+            self.size = tuple(size)
+        elif tuple(size) != self.size:
+            raise ValueError("Invalid parameter ! Frame of size " + str(tuple(size)) + " in a video of size " +
+                             str(self.size))
+        self.file.write(data)
+        self.num_of_frames = self.num_of_frames + 1
+
+    def close(self):
+        self.file.close()
+        if self.size is not None:
+            with open(self.header_path, "w") as f:
+                json.dump({"width": self.size[0], "height": self.size[1], "pix_fmt": RawVideoWriter.PIXEL_FORMAT,
+                           "num_of_frames": self.num_of_frames}, f)
+
+
+class ImageSequenceWriter(object):
+    # One image file per frame, the format is given by the extension (png, bmp, tga, jpg)
+
+    def __init__(self, directory, extension="png"):
+        self.directory = directory
+        self.extension = extension
+        self.count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, data, size):
+        image = pygame.image.frombuffer(data, size, "RGB")
+        pygame.image.save(image, os.path.join(self.directory, "frame_%06d.%s" % (self.count, self.extension)))
+        self.count = self.count + 1
+
+    def close(self):
+        pass
+
+
+class AsyncWriter(object):
+    # Encodes and writes frames in a background thread while the next frames are simulated and drawn.
+    # The queue is bounded so that a slow writer throttles the producer instead of buffering the episode
+
+    def __init__(self, writer, queue_size=64):
+        self.writer = writer
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.error = None
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def __run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error is None:
+                try:
+                    self.writer.write(*item)
+                except Exception as e:
+                    self.error = e
+
+    def write(self, data, size):
+        if self.error is not None:
+            raise self.error
+        self.queue.put((data, size))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        self.writer.close()
+        if self.error is not None:
+            raise self.error
+
+
+class VideoExporter(object):
+    # Replays recorded episodes headlessly at full speed and streams their frames to a writer.
+    # export_all() spreads the episodes over a pool of processes, each with its own EpisodePlayer
+
+    RAW_VIDEO = "rgb"
+    IMAGE_SEQUENCE = "png"
+
+    def __init__(self, recording_path, output_dir, writer=RAW_VIDEO, frame_step=1):
+        self.recording_path = recording_path
+        self.output_dir = output_dir
+        self.writer = writer
+        self.frame_step = max(frame_step, 1)
+        self.player = None
+
+    def __create_writer(self, episode):
+        if self.writer == VideoExporter.RAW_VIDEO:
+            return RawVideoWriter(os.path.join(self.output_dir, "episode_%d.rgb" % episode))
+        return ImageSequenceWriter(os.path.join(self.output_dir, "episode_%d" % episode), extension=self.writer)
+
+    def export(self, episode):
+        if self.player is None:
+            self.player = EpisodePlayer(self.recording_path)
+        os.makedirs(self.output_dir, exist_ok=True)
+        writer = AsyncWriter(self.__create_writer(episode))
+        try:
+            for frame in range(0, self.player.get_num_of_frames(episode) + 1, self.frame_step):
+                game = self.player.seek(episode, frame)
+                game.get_state(view=True)
+                writer.write(pygame.image.tobytes(game.screen, "RGB"), game.screen.get_size())
+        finally:
+            writer.close()
+        return writer.writer.path if self.writer == VideoExporter.RAW_VIDEO else writer.writer.directory
+
+    def export_all(self, episodes=None, num_of_workers=None, start_method=None):
+        if episodes is None:
+            episodes = range(EpisodePlayer(self.recording_path).get_num_of_episodes())
+        episodes = list(episodes)
+        if num_of_workers == 1 or len(episodes) <= 1:
+            return [self.export(episode) for episode in episodes]
+        ctx = mp.get_context(start_method)
+        pool = ctx.Pool(num_of_workers, initializer=_init_worker,
+                        initargs=(self.recording_path, self.output_dir, self.writer, self.frame_step))
+        # SDL turns SIGTERM into a quit event in processes that have initialised pygame, so the workers are
+        # closed and joined rather than terminated
+        try:
+            return pool.map(_export_worker, episodes, chunksize=1)
+        finally:
+            pool.close()
+            pool.join()
+
+
+_exporter = None
+
+
+def _init_worker(recording_path, output_dir, writer, frame_step):
+    global _exporter
+    _exporter = VideoExporter(recording_path, output_dir, writer=writer, frame_step=frame_step)
+
+
+def _export_worker(episode):
+    return _exporter.export(episode)
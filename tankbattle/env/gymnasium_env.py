@@ -0,0 +1,132 @@
+import numpy as np
+import gymnasium as gym
+from gymnasium import spaces
+from gymnasium.vector import VectorEnv, AutoresetMode
+from gymnasium.vector.utils import batch_space
+from tankbattle.env.engine import TankBattle
+from tankbattle.env.vector import VecTankBattle
+from tankbattle.env.constants import GlobalConstants
+
+# Gymnasium interface of the game (requires gymnasium >= 1.0, which the engines themselves do not need).
+# Importing this module registers "TankBattle-v0": gym.make() creates a TankBattleEnv and gym.make_vec() a
+# TankBattleVectorEnv that steps all games in one batch instead of looping over single envs.
+# Rewards are the sum of the players' rewards; per player rewards are given in info["rewards"]
+
+
+def _action_space(two_players):
+    if two_players:
+        return spaces.MultiDiscrete([GlobalConstants.NUM_OF_ACTIONS, GlobalConstants.NUM_OF_ACTIONS])
+    return spaces.Discrete(GlobalConstants.NUM_OF_ACTIONS)
+
+
+class TankBattleEnv(gym.Env):
+    # One game (TankBattle or ArrayTankBattle given by env_class). Observations are the states of state_mode
+    # indexed [x, y]; the episode is truncated rather than terminated when it reaches max_frames
+
+    metadata = {"render_modes": ["human", "rgb_array"], "render_fps": 60}
+
+    def __init__(self, render_mode=None, env_class=TankBattle, max_frames=100000, frame_skip=1, num_of_enemies=5,
+                 two_players=False, state_mode=GlobalConstants.GRID_STATE, state_size=GlobalConstants.GRAY_STATE_SIZE):
+        if render_mode is not None and render_mode not in TankBattleEnv.metadata["render_modes"]:
+            raise ValueError("Invalid parameter ! Unknown render mode: " + str(render_mode))
+        self.render_mode = render_mode
+        self.two_players = two_players
+        kwargs = {}
+        if env_class is TankBattle:
+            kwargs = dict(player1_human_control=False, player2_human_control=False)
+        self.game = env_class(render=render_mode == "human", speed=TankBattleEnv.metadata["render_fps"],
+                              max_frames=max_frames, frame_skip=frame_skip, num_of_enemies=num_of_enemies,
+                              two_players=two_players, state_mode=state_mode, state_size=state_size, **kwargs)
+        self.observation_space = spaces.Box(0, 255, self.game.get_state().shape, dtype=np.uint8)
+        self.action_space = _action_space(two_players)
+
+    def __get_info(self, rewards):
+        return {"rewards": rewards, "frame": self.game.frames_count, "total_score": self.game.total_score,
+                "score_p1": self.game.total_score_p1, "score_p2": self.game.total_score_p2}
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self.game.set_seed(seed)
+        self.game.reset()
+        return self.game.get_state(), self.__get_info([0, 0])
+
+    def step(self, action):
+        if self.two_players:
+            rewards = self.game.step(int(action[0]), int(action[1]))
+        else:
+            rewards = self.game.step(int(action))
+        end_of_game = self.game.is_terminal()
+        truncated = end_of_game and 0 < self.game.max_frames < self.game.frames_count
+        return (self.game.get_state(), float(rewards[0] + rewards[1]), end_of_game and not truncated, truncated,
+                self.__get_info(rewards))
+
+    def render(self):
+        # The human window is drawn by the game itself at every frame
+        if self.render_mode == "rgb_array":
+            return np.ascontiguousarray(self.game.get_state(mode=GlobalConstants.RGB_STATE, view=True)
+                                        .transpose(1, 0, 2))
+        return None
+
+
+class TankBattleVectorEnv(VectorEnv):
+    # num_envs games stepped in lockstep by VecTankBattle. Finished games restart within the step that ended
+    # them (same-step autoreset): their last observation and info are in info["final_obs"] and
+    # info["final_info"]. With copy=False the observations are the internal buffer, overwritten by the next step
+
+    metadata = {"render_modes": ["rgb_array"], "render_fps": 60, "autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(self, num_envs=1, render_mode=None, max_frames=100000, frame_skip=1, num_of_enemies=5,
+                 two_players=False, state_mode=GlobalConstants.GRID_STATE, state_size=GlobalConstants.GRAY_STATE_SIZE,
+                 copy=True):
+        if render_mode is not None and render_mode not in TankBattleVectorEnv.metadata["render_modes"]:
+            raise ValueError("Invalid parameter ! Unknown render mode: " + str(render_mode))
+        self.num_envs = num_envs
+        self.render_mode = render_mode
+        self.two_players = two_players
+        self.copy = copy
+        self.vec = VecTankBattle(num_envs, max_frames=max_frames, frame_skip=frame_skip,
+                                 num_of_enemies=num_of_enemies, two_players=two_players, state_mode=state_mode,
+                                 state_size=state_size)
+        self.single_observation_space = spaces.Box(0, 255, self.vec.states.shape[1:], dtype=np.uint8)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.single_action_space = _action_space(two_players)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+    def __states(self, states):
+        return states.copy() if self.copy else states
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self.vec.set_seed(seed)
+        return self.__states(self.vec.reset()), {}
+
+    def step(self, actions):
+        states, rewards, end_of_games = self.vec.step(actions)
+        truncations = self.vec.truncations.copy()
+        terminations = end_of_games & ~truncations
+        infos = {"rewards": rewards}
+        if end_of_games.any():
+            # Values of the games that ended in this step, masked by "_final_obs" / "_final_info"
+            final_obs = np.empty(self.num_envs, dtype=object)
+            final_info = np.empty(self.num_envs, dtype=object)
+            for game, state in zip(np.nonzero(end_of_games)[0], self.vec.final_states):
+                final_obs[game] = state
+                scores = self.vec.episode_scores[game]
+                final_info[game] = {"rewards": rewards[game], "total_score": int(scores[0]),
+                                    "score_p1": int(scores[1]), "score_p2": int(scores[2])}
+            infos.update(final_obs=final_obs, _final_obs=end_of_games, final_info=final_info,
+                         _final_info=end_of_games)
+        return (self.__states(states), rewards.sum(axis=1).astype(np.float64), terminations, truncations,
+                infos)
+
+    def render(self):
+        if self.render_mode == "rgb_array":
+            return tuple(np.ascontiguousarray(self.vec.get_frame(game).transpose(1, 0, 2))
+                         for game in range(self.num_envs))
+        return None
+
+
+if "TankBattle-v0" not in gym.registry:
+    gym.register(id="TankBattle-v0", entry_point=TankBattleEnv, vector_entry_point=TankBattleVectorEnv)
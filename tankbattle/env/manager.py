@@ -1,5 +1,9 @@
 import pygame
+import os
+import sys
+import numpy as np
 from tankbattle.env.utils import Utils
+from tankbattle.env.constants import GlobalConstants
 
 
 class ResourceManager(object):
@@ -24,128 +28,142 @@ class ResourceManager(object):
     ENEMY_LEFT = "enemy_left"
     ENEMY_RIGHT = "enemy_right"
     ENEMY_DOWN = "enemy_down"
+    PLAYER3_UP = "player2.png"
+    PLAYER3_LEFT = "player3_left"
+    PLAYER3_RIGHT = "player3_right"
+    PLAYER3_DOWN = "player3_down"
+    PLAYER4_UP = "player3.png"
+    PLAYER4_LEFT = "player4_left"
+    PLAYER4_RIGHT = "player4_right"
+    PLAYER4_DOWN = "player4_down"
+    PLAYER5_UP = "player4.png"
+    PLAYER5_LEFT = "player5_left"
+    PLAYER5_RIGHT = "player5_right"
+    PLAYER5_DOWN = "player5_down"
+
+    # Images scaled to a whole tile
+    TILES = (HARD_WALL, SOFT_WALL, SEA_WALL, BASE, EXPLOSION_1, EXPLOSION_2, EXPLOSION_3)
+
+    # Tank images rotated from the UP image: UP, LEFT, RIGHT, DOWN
+    TANKS = ((PLAYER1_UP, PLAYER1_LEFT, PLAYER1_RIGHT, PLAYER1_DOWN),
+             (PLAYER2_UP, PLAYER2_LEFT, PLAYER2_RIGHT, PLAYER2_DOWN),
+             (ENEMY_UP, ENEMY_LEFT, ENEMY_RIGHT, ENEMY_DOWN),
+             (PLAYER3_UP, PLAYER3_LEFT, PLAYER3_RIGHT, PLAYER3_DOWN),
+             (PLAYER4_UP, PLAYER4_LEFT, PLAYER4_RIGHT, PLAYER4_DOWN),
+             (PLAYER5_UP, PLAYER5_LEFT, PLAYER5_RIGHT, PLAYER5_DOWN))
+
+    # Tank images of the players, player i uses PLAYERS[i % len(PLAYERS)]
+    PLAYERS = (TANKS[0], TANKS[1], TANKS[3], TANKS[4], TANKS[5])
+
+    # Baked RGBA pixels of every image for one tile size (see bake_bundle), stored back to back in this order
+    BUNDLE_FILE = "bundle_%d.npy"
+    BUNDLE_KEYS = TILES + TANKS[0] + TANKS[1] + TANKS[2] + (BULLET,)
+
+    # Process-wide caches shared by all instances, images keyed by tile size and fonts by their size. Images are
+    # drawn on the RGB canvas of the game (see Utils.create_canvas), never on the window, so they are not converted
+    # to the display format and rendering games share them. Cached surfaces must not be modified
+    images_cache = {}
+    fonts_cache = {}
 
     def __init__(self, current_path, font_size, tile_size, is_render):
         self.font_size = font_size
         self.tile_size = tile_size
-        self.bullet_size = int(tile_size/6)
+        self.bullet_size = max(int(tile_size/6), 1)
         self.current_path = current_path + '/graphics/'
         self.render = is_render
-        pygame.font.init()
-        self.font = pygame.font.Font(self.current_path + "font.ttf", self.font_size)
-        self.font.set_bold(True)
-        self.resources = {}
-        self.__add_resources()
-
-    def __add_resources(self):
-        image = pygame.image.load(self.current_path + ResourceManager.HARD_WALL)
-        if self.render:
-            image = pygame.transform.scale(image, (self.tile_size, self.tile_size)).convert_alpha()
-        else:
+        self.resources = ResourceManager.images_cache.setdefault(tile_size, {})
+        if len(self.resources) == 0:
+            self.__load_bundle()
+
+    def __image_size(self, key):
+        if key in ResourceManager.TILES:
+            return self.tile_size, self.tile_size
+        if key == ResourceManager.BULLET:
+            return self.bullet_size, self.bullet_size
+        return self.tile_size - 1, self.tile_size - 1
+
+    def __load_bundle(self):
+        # Wrap the memory-mapped bundle as surfaces, or fall back to the PNG files if there is no valid bundle
+        path = self.current_path + ResourceManager.BUNDLE_FILE % self.tile_size
+        if not os.path.isfile(path):
+            return
+        pixels = np.load(path, mmap_mode='r')
+        sizes = [self.__image_size(key) for key in ResourceManager.BUNDLE_KEYS]
+        if pixels.ndim != 1 or pixels.dtype != np.uint8 or len(pixels) != sum(w * h * 4 for w, h in sizes):
+            return
+        offset = 0
+        for key, size in zip(ResourceManager.BUNDLE_KEYS, sizes):
+            length = size[0] * size[1] * 4
+            image = pygame.image.frombuffer(pixels[offset:offset + length], size, "RGBA")
+            self.resources[key] = image
+            offset = offset + length
+
+    @staticmethod
+    def bake_bundle(current_path, tile_size):
+        # Decode, rotate and scale every image from the PNG files and save the pixels as one uncompressed array
+        # next to them. Games with this tile size then start from the bundle
+        rc_manager = ResourceManager(current_path, 0, tile_size, False)
+        rc_manager.resources = {}
+        pixels = []
+        for key in ResourceManager.BUNDLE_KEYS:
+            rc_manager.__load_resource(key)
+            image = rc_manager.resources[key]
+            pixels.append(np.frombuffer(pygame.image.tobytes(image, "RGBA"), dtype=np.uint8))
+        path = rc_manager.current_path + ResourceManager.BUNDLE_FILE % tile_size
+        np.save(path, np.concatenate(pixels))
+        return path
+
+    def __load_resource(self, key):
+        # Images are decoded and transformed the first time they are requested
+        if key in ResourceManager.TILES:
+            image = pygame.image.load(self.current_path + key)
             image = pygame.transform.scale(image, (self.tile_size, self.tile_size))
-
-        self.resources[ResourceManager.HARD_WALL] = image
-
-        image = pygame.image.load(self.current_path + ResourceManager.SOFT_WALL)
-        if self.render:
-            image = pygame.transform.scale(image, (self.tile_size, self.tile_size)).convert_alpha()
+            self.resources[key] = image
+        elif key == ResourceManager.BULLET:
+            image = pygame.Surface([self.bullet_size, self.bullet_size])
+            image.fill(Utils.get_color(Utils.WHITE))
+            self.resources[key] = image
         else:
-            image = pygame.transform.scale(image, (self.tile_size, self.tile_size))
-        self.resources[ResourceManager.SOFT_WALL] = image
+            for keys in ResourceManager.TANKS:
+                if key in keys:
+                    break
+            else:
+                raise ValueError("Invalid parameter ! Unknown resource: " + str(key))
+            image_up = pygame.image.load(self.current_path + keys[0])
+            images = [image_up, pygame.transform.rotate(image_up, 90), pygame.transform.rotate(image_up, -90),
+                      pygame.transform.rotate(image_up, 180)]
+            for name, image in zip(keys, images):
+                image = pygame.transform.scale(image, (self.tile_size - 1, self.tile_size - 1))
+                self.resources[name] = image
 
-        image = pygame.image.load(self.current_path + ResourceManager.SEA_WALL)
-        if self.render:
-            image = pygame.transform.scale(image, (self.tile_size, self.tile_size)).convert_alpha()
+    def get_image(self, key):
+        image = self.resources.get(key)
+        if image is None:
+            self.__load_resource(key)
+            image = self.resources[key]
+        return image
+
+    def get_tank_images(self, player):
+        # LEFT, RIGHT, UP and DOWN images of a player (or of the enemies if player is None)
+        if player is None:
+            keys = ResourceManager.TANKS[2]
         else:
-            image = pygame.transform.scale(image, (self.tile_size, self.tile_size))
-        self.resources[ResourceManager.SEA_WALL] = image
+            keys = ResourceManager.PLAYERS[player % len(ResourceManager.PLAYERS)]
+        return (self.get_image(keys[1]), self.get_image(keys[2]), self.get_image(keys[0]), self.get_image(keys[3]))
 
-        image = pygame.image.load(self.current_path + ResourceManager.BASE)
-        if self.render:
-            image = pygame.transform.scale(image, (self.tile_size, self.tile_size)).convert_alpha()
-        else:
-            image = pygame.transform.scale(image, (self.tile_size, self.tile_size))
-        self.resources[ResourceManager.BASE] = image
-
-        image_up = pygame.image.load(self.current_path + ResourceManager.PLAYER1_UP)
-        image_left = pygame.transform.rotate(image_up, 90)
-        image_right = pygame.transform.rotate(image_up, -90)
-        image_down = pygame.transform.rotate(image_up, 180)
-        if self.render:
-            image_up = pygame.transform.scale(image_up, (self.tile_size-1, self.tile_size-1)).convert_alpha()
-            image_left = pygame.transform.scale(image_left, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_right = pygame.transform.scale(image_right, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_down = pygame.transform.scale(image_down, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-        else:
-            image_up = pygame.transform.scale(image_up, (self.tile_size - 1, self.tile_size - 1))
-            image_left = pygame.transform.scale(image_left, (self.tile_size - 1, self.tile_size - 1))
-            image_right = pygame.transform.scale(image_right, (self.tile_size - 1, self.tile_size - 1))
-            image_down = pygame.transform.scale(image_down, (self.tile_size - 1, self.tile_size - 1))
-        self.resources[ResourceManager.PLAYER1_UP] = image_up
-        self.resources[ResourceManager.PLAYER1_LEFT] = image_left
-        self.resources[ResourceManager.PLAYER1_RIGHT] = image_right
-        self.resources[ResourceManager.PLAYER1_DOWN] = image_down
-
-        image_up = pygame.image.load(self.current_path + ResourceManager.PLAYER2_UP)
-        image_left = pygame.transform.rotate(image_up, 90)
-        image_right = pygame.transform.rotate(image_up, -90)
-        image_down = pygame.transform.rotate(image_up, 180)
-        if self.render:
-            image_up = pygame.transform.scale(image_up, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_left = pygame.transform.scale(image_left, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_right = pygame.transform.scale(image_right, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_down = pygame.transform.scale(image_down, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-        else:
-            image_up = pygame.transform.scale(image_up, (self.tile_size - 1, self.tile_size - 1))
-            image_left = pygame.transform.scale(image_left, (self.tile_size - 1, self.tile_size - 1))
-            image_right = pygame.transform.scale(image_right, (self.tile_size - 1, self.tile_size - 1))
-            image_down = pygame.transform.scale(image_down, (self.tile_size - 1, self.tile_size - 1))
-        self.resources[ResourceManager.PLAYER2_UP] = image_up
-        self.resources[ResourceManager.PLAYER2_LEFT] = image_left
-        self.resources[ResourceManager.PLAYER2_RIGHT] = image_right
-        self.resources[ResourceManager.PLAYER2_DOWN] = image_down
-
-        image_up = pygame.image.load(self.current_path + ResourceManager.ENEMY_UP)
-        image_left = pygame.transform.rotate(image_up, 90)
-        image_right = pygame.transform.rotate(image_up, -90)
-        image_down = pygame.transform.rotate(image_up, 180)
-        if self.render:
-            image_up = pygame.transform.scale(image_up, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_left = pygame.transform.scale(image_left, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_right = pygame.transform.scale(image_right, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-            image_down = pygame.transform.scale(image_down, (self.tile_size - 1, self.tile_size - 1)).convert_alpha()
-        else:
-            image_up = pygame.transform.scale(image_up, (self.tile_size - 1, self.tile_size - 1))
-            image_left = pygame.transform.scale(image_left, (self.tile_size - 1, self.tile_size - 1))
-            image_right = pygame.transform.scale(image_right, (self.tile_size - 1, self.tile_size - 1))
-            image_down = pygame.transform.scale(image_down, (self.tile_size - 1, self.tile_size - 1))
-        self.resources[ResourceManager.ENEMY_UP] = image_up
-        self.resources[ResourceManager.ENEMY_LEFT] = image_left
-        self.resources[ResourceManager.ENEMY_RIGHT] = image_right
-        self.resources[ResourceManager.ENEMY_DOWN] = image_down
-
-        image = pygame.Surface([self.bullet_size, self.bullet_size])
-        image.fill(Utils.get_color(Utils.WHITE))
-        self.resources[ResourceManager.BULLET] = image
-
-        image_1 = pygame.image.load(self.current_path + ResourceManager.EXPLOSION_1)
-        image_2 = pygame.image.load(self.current_path + ResourceManager.EXPLOSION_2)
-        image_3 = pygame.image.load(self.current_path + ResourceManager.EXPLOSION_3)
-        if self.render:
-            image_1 = pygame.transform.scale(image_1, (self.tile_size, self.tile_size)).convert_alpha()
-            image_2 = pygame.transform.scale(image_2, (self.tile_size, self.tile_size)).convert_alpha()
-            image_3 = pygame.transform.scale(image_3, (self.tile_size, self.tile_size)).convert_alpha()
-        else:
-            image_1 = pygame.transform.scale(image_1, (self.tile_size, self.tile_size))
-            image_2 = pygame.transform.scale(image_2, (self.tile_size, self.tile_size))
-            image_3 = pygame.transform.scale(image_3, (self.tile_size, self.tile_size))
+    def get_font(self):
+        font = ResourceManager.fonts_cache.get(self.font_size)
+        if font is None:
+            pygame.font.init()
+            font = pygame.font.Font(self.current_path + "font.ttf", self.font_size)
+            font.set_bold(True)
+            ResourceManager.fonts_cache[self.font_size] = font
+        return font
 
-        self.resources[ResourceManager.EXPLOSION_1] = image_1
-        self.resources[ResourceManager.EXPLOSION_2] = image_2
-        self.resources[ResourceManager.EXPLOSION_3] = image_3
 
-    def get_image(self, key):
-        return self.resources[key]
+if __name__ == '__main__':
 
-    def get_font(self):
-        return self.font
+    # python -m tankbattle.env.manager [tile_size ...]
+    env_path = os.path.dirname(os.path.abspath(__file__))
+    for size in sys.argv[1:] or [GlobalConstants.TILE_SIZE]:
+        print("Baked", ResourceManager.bake_bundle(env_path, int(size)))
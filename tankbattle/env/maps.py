@@ -1,20 +1,55 @@
+import os
+import json
+import numpy as np
 from tankbattle.env.sprites.wall import WallSprite
 from tankbattle.env.constants import GlobalConstants
 from tankbattle.env.manager import ResourceManager
 
 
 class StageMap(object):
-    def __init__(self, num_of_tiles, tile_size, current_path, sprites, walls, resources_manager):
-        self.num_of_stages = 1
+    # Characters of the text stage format, one per tile
+    TILE_CHARS = {".": -1, "w": GlobalConstants.WALL_TILE, "r": GlobalConstants.ROCK_TILE,
+                  "s": GlobalConstants.SEA_TILE}
+
+    # Sprite image and object type of every tile
+    TILE_SPRITES = {GlobalConstants.WALL_TILE: (ResourceManager.SOFT_WALL, GlobalConstants.SOFT_OBJECT),
+                    GlobalConstants.ROCK_TILE: (ResourceManager.HARD_WALL, GlobalConstants.HARD_OBJECT),
+                    GlobalConstants.SEA_TILE: (ResourceManager.SEA_WALL, GlobalConstants.TRANSPARENT_OBJECT)}
+
+    # Generated stages: one wall segment per TILES_PER_SEGMENT tiles of the arena, of these tiles
+    TILES_PER_SEGMENT = 24
+    GENERATED_TILES = (GlobalConstants.WALL_TILE, GlobalConstants.ROCK_TILE, GlobalConstants.SEA_TILE)
+    GENERATED_PROBS = (0.7, 0.15, 0.15)
+
+    # Process-wide cache of the parsed stage files, keyed by path and modification time. Cached stages are
+    # read-only arrays
+    stages_cache = {}
+
+    def __init__(self, num_of_tiles, tile_size, current_path, sprites, walls, resources_manager, stages=None):
+        # stages: stage files (see load_stages) and / or tile grids, the built-in stage if None
         self.num_of_tiles = num_of_tiles
-        self.map = [None] * self.num_of_stages
         self.current_path = current_path
         self.sprites = sprites
         self.walls = walls
         self.tile_size = tile_size
         self.rc = resources_manager
 
-        self.__build_map()
+        if stages is None:
+            self.__build_map()
+        else:
+            self.map = []
+            for stage in stages:
+                if isinstance(stage, str):
+                    self.map.extend(StageMap.load_stages(stage))
+                else:
+                    self.map.append(StageMap.__check_stage(np.array(stage, dtype=np.int8)))
+            if len(self.map) == 0:
+                raise ValueError("Invalid parameter ! No stage given")
+        self.num_of_stages = len(self.map)
+
+        # Stages are scaled to the size of the arena
+        for stage in range(self.num_of_stages):
+            self.map[stage] = StageMap.__scale(self.map[stage], self.num_of_tiles)
 
     def __build_map(self):
         #########################################################################
@@ -23,6 +58,7 @@ class StageMap(object):
         # We can make a static or dynamic map
         # This is a static map (it is better to use dynamic when num_of_tiles is
         # unknown). However, static map is easier to create a stage.
+        self.map = [None]
         self.map[0] = [[-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1],
                        [-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1],
                        [-1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1, -1],
@@ -46,6 +82,142 @@ class StageMap(object):
         # END OF STAGE 1
         #########################################################################
         #########################################################################
+        self.map[0] = np.array(self.map[0], dtype=np.int8)
+
+    @staticmethod
+    def __scale(stage, num_of_tiles):
+        # Nearest tile scaling: every tile of the arena takes the tile at the same relative position of the stage
+        if stage.shape != (num_of_tiles, num_of_tiles):
+            rows = np.arange(num_of_tiles) * stage.shape[0] // num_of_tiles
+            cols = np.arange(num_of_tiles) * stage.shape[1] // num_of_tiles
+            stage = stage[np.ix_(rows, cols)]
+        stage.flags.writeable = False
+        return stage
+
+    @staticmethod
+    def __check_stage(stage):
+        if stage.ndim != 2 or min(stage.shape) == 0:
+            raise ValueError("Invalid parameter ! A stage must be a non-empty grid of tiles")
+        if not np.isin(stage, [-1] + list(StageMap.TILE_SPRITES)).all():
+            raise ValueError("Invalid parameter ! Unknown tile in stage")
+        return stage
+
+    @staticmethod
+    def __parse_row(row, where):
+        # A row is a string of TILE_CHARS or a list of tile numbers, where locates it in the file
+        if isinstance(row, str):
+            for c in row:
+                if c not in StageMap.TILE_CHARS:
+                    raise ValueError("Invalid parameter ! Unknown tile character " + repr(c) + " at " + where)
+            return [StageMap.TILE_CHARS[c] for c in row]
+        try:
+            tiles = [int(tile) for tile in row]
+        except (TypeError, ValueError):
+            raise ValueError("Invalid parameter ! A row must be a string or a list of tile numbers at " + where)
+        for tile in tiles:
+            if tile != -1 and tile not in StageMap.TILE_SPRITES:
+                raise ValueError("Invalid parameter ! Unknown tile " + str(tile) + " at " + where)
+        return tiles
+
+    @staticmethod
+    def __parse_rows(rows):
+        # rows: (where, row) pairs of one stage
+        tiles = []
+        for where, row in rows:
+            tiles.append(StageMap.__parse_row(row, where))
+            if len(tiles[-1]) != len(tiles[0]):
+                raise ValueError("Invalid parameter ! Row of " + str(len(tiles[-1])) + " tiles at " + where +
+                                 ", the stage has rows of " + str(len(tiles[0])) + " tiles")
+        return StageMap.__check_stage(np.array(tiles, dtype=np.int8))
+
+    @staticmethod
+    def load_stages(path):
+        # Stages of a file, parsed once per process:
+        # - text: one row per line and one character of TILE_CHARS per tile, stages separated by blank lines
+        # - JSON (.json): {"stages": [stage, ...]} where a stage is a list of rows (strings or tile numbers)
+        path = os.path.abspath(path)
+        key = (path, os.path.getmtime(path))
+        stages = StageMap.stages_cache.get(key)
+        if stages is None:
+            with open(path) as f:
+                if path.endswith(".json"):
+                    blocks = StageMap.__read_json(f, path)
+                else:
+                    blocks = StageMap.__read_text(f, path)
+            stages = []
+            for rows in blocks:
+                stage = StageMap.__parse_rows(rows)
+                stage.flags.writeable = False
+                stages.append(stage)
+            if len(stages) == 0:
+                raise ValueError("Invalid parameter ! No stage in " + path)
+            stages = tuple(stages)
+            StageMap.stages_cache[key] = stages
+        return list(stages)
+
+    @staticmethod
+    def __read_text(f, path):
+        # Rows located by line number, stages separated by blank lines
+        blocks = [[]]
+        for line_number, line in enumerate(f, 1):
+            row = line.strip()
+            if row:
+                blocks[-1].append((path + ":" + str(line_number), row))
+            elif len(blocks[-1]) > 0:
+                blocks.append([])
+        return [block for block in blocks if len(block) > 0]
+
+    @staticmethod
+    def __read_json(f, path):
+        # Rows located by stage and row index
+        try:
+            stages = json.load(f)["stages"]
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError("Invalid parameter ! " + path + " is not a JSON object with a stages list: " + str(e))
+        if not isinstance(stages, list):
+            raise ValueError("Invalid parameter ! The stages of " + path + " must be a list")
+        blocks = []
+        for i, stage in enumerate(stages):
+            if not isinstance(stage, list):
+                raise ValueError("Invalid parameter ! Stage " + str(i) + " of " + path + " is not a list of rows")
+            blocks.append([(path + " stage " + str(i) + " row " + str(j), row) for j, row in enumerate(stage)])
+        return blocks
+
+    @staticmethod
+    def generate_stage(rng, num_of_tiles):
+        # Random stage drawn from the generator rng: straight wall segments on the left half, mirrored to the
+        # right half. The two top rows and the three bottom rows stay free for the enemies, the base and the players
+        n = num_of_tiles
+        half = (n + 1) // 2
+        stage = np.full((n, n), -1, dtype=np.int8)
+        k = max(n * n // StageMap.TILES_PER_SEGMENT, 1)
+        xs = rng.integers(1, half, k)
+        ys = rng.integers(2, max(n - 3, 3), k)
+        lengths = rng.integers(1, max(n // 4, 1) + 1, k)
+        vertical = rng.random(k) < 0.5
+        tiles = rng.choice(np.array(StageMap.GENERATED_TILES, dtype=np.int8), k, p=StageMap.GENERATED_PROBS)
+
+        # Tiles of all segments at once, cut at the middle column and above the bottom rows
+        steps = np.arange(lengths.max())
+        mask = steps < lengths[:, None]
+        xs = (xs[:, None] + np.where(vertical[:, None], 0, steps))[mask]
+        ys = (ys[:, None] + np.where(vertical[:, None], steps, 0))[mask]
+        tiles = np.broadcast_to(tiles[:, None], mask.shape)[mask]
+        inside = (xs < half) & (ys < n - 3)
+        stage[ys[inside], xs[inside]] = tiles[inside]
+        stage[:, half:] = stage[:, n - half - 1::-1]
+        stage.flags.writeable = False
+        return stage
+
+    def generate(self, stage, rng):
+        self.map[stage] = StageMap.generate_stage(rng, self.num_of_tiles)
+
+    def set_stage(self, stage, tiles):
+        # Replaces a stage (e.g. a generated stage restored from a snapshot)
+        while len(self.map) <= stage:
+            self.map.append(self.map[0])
+        self.map[stage] = StageMap.__scale(np.array(tiles, dtype=np.int8), self.num_of_tiles)
+        self.num_of_stages = len(self.map)
 
     def load_map(self, stage):
         if stage >= self.num_of_stages:
@@ -58,27 +230,27 @@ class StageMap(object):
         #     self.sprites.add(wall)
         #     self.walls.add(wall)
 
-        # This is for static map
-        for row in range(len(self.map[stage])):
-            for col in range(len(self.map[stage][row])):
-                if self.map[stage][row][col] == GlobalConstants.WALL_TILE:
-                    wall_bg = self.rc.get_image(ResourceManager.SOFT_WALL)
-                    wall = WallSprite(self.tile_size, col, row, wall_bg)
-                    wall.type = GlobalConstants.SOFT_OBJECT
-                    self.sprites.add(wall)
-                    self.walls.add(wall)
-                elif self.map[stage][row][col] == GlobalConstants.ROCK_TILE:
-                    wall_bg = self.rc.get_image(ResourceManager.HARD_WALL)
-                    wall = WallSprite(self.tile_size, col, row, wall_bg)
-                    wall.type = GlobalConstants.HARD_OBJECT
-                    self.sprites.add(wall)
-                    self.walls.add(wall)
-                elif self.map[stage][row][col] == GlobalConstants.SEA_TILE:
-                    wall_bg = self.rc.get_image(ResourceManager.SEA_WALL)
-                    wall = WallSprite(self.tile_size, col, row, wall_bg)
-                    wall.type = GlobalConstants.TRANSPARENT_OBJECT
-                    self.sprites.add(wall)
-                    self.walls.add(wall)
+        # This is for static map (walls are created row by row)
+        tiles = self.map[stage]
+        rows, cols = np.nonzero(tiles >= 0)
+        walls = []
+        for row, col, tile in zip(rows.tolist(), cols.tolist(), tiles[rows, cols].tolist()):
+            image, wall_type = StageMap.TILE_SPRITES[tile]
+            wall = WallSprite(self.tile_size, col, row, self.rc.get_image(image))
+            wall.type = wall_type
+            walls.append(wall)
+        self.sprites.add(walls)
+        self.walls.add(walls)
+
+    def get_grid(self, stage):
+        # Read-only tile grid of the stage
+        if stage >= self.num_of_stages:
+            raise ValueError("Stage out of range !!!")
+        return self.map[stage]
+
+    def get_grids(self):
+        # (num_of_stages, num_of_tiles, num_of_tiles) tile grids of all stages
+        return np.array(self.map)
 
     def number_of_stages(self):
         return self.num_of_stages
\ No newline at end of file
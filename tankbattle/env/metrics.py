@@ -0,0 +1,110 @@
+import time
+import collections as cl
+
+
+class Metrics(object):
+    # Throughput of a game measured on a monotonic clock (see TankBattle.metrics). Frames, steps and resets are
+    # timestamped into bounded deques, rates are only computed when get_stats() is called. Sinks are callables
+    # sink(event, info) receiving a "frame" event every log_freq frames and a "reset" event after every reset
+
+    FRAME_EVENT = "frame"
+    RESET_EVENT = "reset"
+
+    def __init__(self, window=120, log_freq=60, clock=time.perf_counter):
+        if window < 2:
+            raise ValueError("Invalid parameter ! window must be at least 2")
+        self.window = window
+        self.log_freq = max(log_freq, 1)
+        self.clock = clock
+        self.sinks = []
+        self.frame_times = cl.deque(maxlen=window)
+        self.step_times = cl.deque(maxlen=window)
+        self.reset_latencies = cl.deque(maxlen=window)
+        self.reset()
+
+    def reset(self):
+        self.started_time = self.clock()
+        self.episode_started_time = self.started_time
+        self.num_of_frames = 0
+        self.num_of_steps = 0
+        self.num_of_episodes = 0
+        self.episode_frames = 0
+        self.frame_times.clear()
+        self.step_times.clear()
+        self.reset_latencies.clear()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def add_frame(self):
+        # Returns True when the sinks expect a frame event
+        self.frame_times.append(self.clock())
+        self.num_of_frames = self.num_of_frames + 1
+        self.episode_frames = self.episode_frames + 1
+        return len(self.sinks) > 0 and self.num_of_frames % self.log_freq == 0
+
+    def add_step(self):
+        self.step_times.append(self.clock())
+        self.num_of_steps = self.num_of_steps + 1
+
+    def begin_reset(self):
+        return self.clock()
+
+    def end_reset(self, started):
+        now = self.clock()
+        self.reset_latencies.append(now - started)
+        self.num_of_episodes = self.num_of_episodes + 1
+        self.episode_started_time = now
+        self.episode_frames = 0
+
+    def emit(self, event, info):
+        for sink in self.sinks:
+            sink(event, info)
+
+    @staticmethod
+    def __rates(times):
+        # Instantaneous rate from the last interval and windowed rate over the whole deque
+        if len(times) < 2:
+            return 0.0, 0.0
+        last = times[-1] - times[-2]
+        span = times[-1] - times[0]
+        return 1.0 / last if last > 0 else 0.0, (len(times) - 1) / span if span > 0 else 0.0
+
+    def get_stats(self):
+        now = self.clock()
+        fps, fps_window = Metrics.__rates(self.frame_times)
+        sps, sps_window = Metrics.__rates(self.step_times)
+        elapsed = now - self.started_time
+        episode_elapsed = now - self.episode_started_time
+        latencies = self.reset_latencies
+        return {
+            "frames": self.num_of_frames,
+            "steps": self.num_of_steps,
+            "episodes": self.num_of_episodes,
+            "fps": fps,
+            "fps_window": fps_window,
+            "fps_episode": self.episode_frames / episode_elapsed if episode_elapsed > 0 else 0.0,
+            "steps_per_sec": sps,
+            "steps_per_sec_window": sps_window,
+            "episodes_per_sec": self.num_of_episodes / elapsed if elapsed > 0 else 0.0,
+            "reset_latency_ms": latencies[-1] * 1000 if len(latencies) > 0 else 0.0,
+            "reset_latency_ms_mean": sum(latencies) * 1000 / len(latencies) if len(latencies) > 0 else 0.0
+        }
+
+
+def print_sink(event, info):
+    # Prints events like the former debug output
+    if event == Metrics.RESET_EVENT:
+        print("#################  RESET GAME  ##################")
+    for name, value in info.items():
+        if isinstance(value, float):
+            print("%s: %.2f" % (name, value))
+        else:
+            print("%s: %s" % (name, value))
+    if event == Metrics.RESET_EVENT:
+        print("#################################################")
+    else:
+        print("")
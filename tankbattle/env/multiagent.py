@@ -0,0 +1,62 @@
+from tankbattle.env.engine import TankBattle
+from tankbattle.env.constants import GlobalConstants
+
+
+class ParallelTankBattle(object):
+    # Parallel multi-agent interface over a game with num_of_players learning tanks (TankBattle or ArrayTankBattle
+    # given by env_class): every step takes one action per live agent and returns dicts keyed by agent name.
+    # Observations of all agents come from one get_observations() pass. An agent is done when its tank is
+    # destroyed or the game ends, and it is then removed from agents until the next reset
+
+    def __init__(self, num_of_players=2, env_class=TankBattle, seed=None, **env_kwargs):
+        if env_class is TankBattle:
+            env_kwargs.setdefault("player1_human_control", False)
+            env_kwargs.setdefault("player2_human_control", False)
+        self.game = env_class(seed=seed, num_of_players=num_of_players, **env_kwargs)
+        self.num_of_players = num_of_players
+        self.possible_agents = ["player_%d" % i for i in range(num_of_players)]
+        self.agent_ids = {agent: i for i, agent in enumerate(self.possible_agents)}
+        self.agents = list(self.possible_agents)
+
+    def __observations(self, agents):
+        observations = self.game.get_observations()
+        return {agent: observations[self.agent_ids[agent]] for agent in agents}
+
+    def __infos(self, agents):
+        scores = self.game.player_scores
+        return {agent: {"score": scores[self.agent_ids[agent]], "total_score": self.game.total_score}
+                for agent in agents}
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.game.set_seed(seed)
+        self.game.reset()
+        self.agents = list(self.possible_agents)
+        return self.__observations(self.agents), self.__infos(self.agents)
+
+    def step(self, actions):
+        # Agents missing from actions do nothing in this step
+        commands = [-1] * self.num_of_players
+        for agent, action in actions.items():
+            commands[self.agent_ids[agent]] = action
+        rewards = self.game.step_players(commands)
+
+        agents = self.agents
+        end_of_game = self.game.is_terminal()
+        truncated = end_of_game and 0 < self.game.max_frames < self.game.frames_count
+        alive = self.game.get_players_alive()
+        terminations = {agent: (end_of_game and not truncated) or not alive[self.agent_ids[agent]]
+                        for agent in agents}
+        truncations = {agent: truncated for agent in agents}
+        self.agents = [agent for agent in agents if not terminations[agent] and not truncations[agent]]
+        return (self.__observations(agents), {agent: rewards[self.agent_ids[agent]] for agent in agents},
+                terminations, truncations, self.__infos(agents))
+
+    def get_state_space(self):
+        return self.game.get_state_space()
+
+    def get_num_of_actions(self):
+        return GlobalConstants.NUM_OF_ACTIONS
+
+    def get_action_space(self):
+        return range(GlobalConstants.NUM_OF_ACTIONS)
@@ -0,0 +1,169 @@
+import multiprocessing as mp
+import numpy as np
+from multiprocessing import shared_memory, resource_tracker
+from tankbattle.env.engine import TankBattle
+from tankbattle.env.constants import GlobalConstants
+
+
+def _worker(remote, parent_remote, first_env, env_class, env_kwargs, seeds):
+    parent_remote.close()
+    envs = [env_class(seed=seed, **env_kwargs) for seed in seeds]
+
+    # The parent allocates the shared block once it knows the shape of a state
+    num_of_players = envs[0].num_of_players
+    remote.send((envs[0].get_state().shape, envs[0].get_state_space(), num_of_players))
+    shm_name, shape = remote.recv()
+    shm = shared_memory.SharedMemory(name=shm_name)
+    states = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)[first_env:first_env + len(seeds)]
+    rewards = np.zeros((len(envs), max(num_of_players, 2)), dtype=np.int64)
+    terminals = np.zeros(len(envs), dtype=bool)
+    scores = np.zeros((len(envs), 1 + max(num_of_players, 2)), dtype=np.int64)
+
+    try:
+        while True:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                for i, env in enumerate(envs):
+                    rewards[i, :num_of_players] = env.step_players(data[i])
+                    terminals[i] = env.is_terminal()
+                    if terminals[i]:
+                        scores[i, 0] = env.total_score
+                        scores[i, 1:1 + num_of_players] = env.player_scores
+                        env.reset()
+                    env.get_state(out=states[i])
+                remote.send((rewards, terminals, scores))
+            elif cmd == "reset":
+                for i, env in enumerate(envs):
+                    env.reset()
+                    env.get_state(out=states[i])
+                remote.send(True)
+            elif cmd == "close":
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        del states
+        shm.close()
+        remote.close()
+
+
+class SubprocVecTankBattle(object):
+    # K worker processes, each hosting several games. States are written by the workers into a shared
+    # memory block so that the parent reads them without pickling; only actions, rewards and terminal
+    # flags go through the pipes (one message per worker and step)
+
+    def __init__(self, num_of_workers, envs_per_worker, seed=None, env_class=TankBattle, start_method=None,
+                 **env_kwargs):
+        self.num_of_workers = num_of_workers
+        self.envs_per_worker = envs_per_worker
+        self.num_of_envs = num_of_workers * envs_per_worker
+        self.num_of_actions = GlobalConstants.NUM_OF_ACTIONS
+        self.waiting = False
+        self.closed = False
+
+        env_kwargs["render"] = False
+        if env_class is TankBattle:
+            env_kwargs["player1_human_control"] = False
+            env_kwargs["player2_human_control"] = False
+
+        if seed is None:
+            seed = np.random.randint(0, 9999)
+        seeds = [(seed + i) % 9999 for i in range(self.num_of_envs)]
+
+        # Workers must share the resource tracker of the parent, otherwise each of them would try to
+        # clean up the shared block when it exits
+        resource_tracker.ensure_running()
+
+        ctx = mp.get_context(start_method)
+        self.remotes, self.processes = [], []
+        for w in range(num_of_workers):
+            remote, work_remote = ctx.Pipe()
+            first = w * envs_per_worker
+            process = ctx.Process(target=_worker,
+                                  args=(work_remote, remote, first, env_class, env_kwargs,
+                                        seeds[first:first + envs_per_worker]),
+                                  daemon=True)
+            process.start()
+            work_remote.close()
+            self.remotes.append(remote)
+            self.processes.append(process)
+
+        state_shape, self.state_space, self.num_of_players = self.remotes[0].recv()
+        for remote in self.remotes[1:]:
+            remote.recv()
+
+        # Rewards and scores have a column per player, at least two (player 2 is 0 in one player games).
+        # Episode scores start with the total score
+        self.rewards = np.zeros((self.num_of_envs, max(self.num_of_players, 2)), dtype=np.int64)
+        self.terminals = np.zeros(self.num_of_envs, dtype=bool)
+        self.episode_scores = np.zeros((self.num_of_envs, 1 + max(self.num_of_players, 2)), dtype=np.int64)
+        shape = (self.num_of_envs,) + tuple(state_shape)
+        self.shm = shared_memory.SharedMemory(create=True, size=int(np.prod(shape)))
+        self.states = np.ndarray(shape, dtype=np.uint8, buffer=self.shm.buf)
+        for remote in self.remotes:
+            remote.send((self.shm.name, shape))
+
+    def reset(self):
+        for remote in self.remotes:
+            remote.send(("reset", None))
+        for remote in self.remotes:
+            remote.recv()
+        return self.states
+
+    def step_async(self, actions):
+        # actions: (N,) for player 1 only or (N, num_of_players) for all players (extra columns are ignored)
+        if self.waiting:
+            raise ValueError("step_async() called twice without step_wait()")
+        actions = np.asarray(actions)
+        commands = np.full((self.num_of_envs, self.num_of_players), -1, dtype=np.int32)
+        if actions.ndim == 1:
+            commands[:, 0] = actions
+        else:
+            commands[:, :actions.shape[1]] = actions[:, :self.num_of_players]
+        for w, remote in enumerate(self.remotes):
+            first = w * self.envs_per_worker
+            remote.send(("step", commands[first:first + self.envs_per_worker]))
+        self.waiting = True
+
+    def step_wait(self):
+        # The returned states are a view of the shared block and are overwritten by the next step
+        for w, remote in enumerate(self.remotes):
+            first = w * self.envs_per_worker
+            rewards, terminals, scores = remote.recv()
+            self.rewards[first:first + self.envs_per_worker] = rewards
+            self.terminals[first:first + self.envs_per_worker] = terminals
+            self.episode_scores[first:first + self.envs_per_worker][terminals] = scores[terminals]
+        self.waiting = False
+        return self.states, self.rewards.copy(), self.terminals.copy()
+
+    def step(self, actions):
+        self.step_async(actions)
+        return self.step_wait()
+
+    def close(self):
+        if self.closed:
+            return
+        if self.waiting:
+            self.step_wait()
+        for remote in self.remotes:
+            remote.send(("close", None))
+        for process in self.processes:
+            process.join()
+        for remote in self.remotes:
+            remote.close()
+        del self.states
+        self.shm.close()
+        self.shm.unlink()
+        self.closed = True
+
+    def get_num_of_envs(self):
+        return self.num_of_envs
+
+    def get_num_of_actions(self):
+        return self.num_of_actions
+
+    def get_action_space(self):
+        return range(self.num_of_actions)
+
+    def get_state_space(self):
+        return self.state_space
@@ -0,0 +1,63 @@
+import time
+import collections as cl
+import numpy as np
+
+
+class Profiler(object):
+    # Opt-in timings and counters per phase of a frame (see TankBattle.set_profiler). Values are accumulated
+    # during a frame and kept for the last window frames; get_stats() aggregates them on demand
+
+    def __init__(self, window=300):
+        self.window = window
+        self.timings = {}
+        self.counters = {}
+        self.current_timings = {}
+        self.current_counters = {}
+        self.num_of_frames = 0
+
+    @staticmethod
+    def start():
+        return time.perf_counter_ns()
+
+    def stop(self, phase, started):
+        elapsed = time.perf_counter_ns() - started
+        self.current_timings[phase] = self.current_timings.get(phase, 0) + elapsed
+
+    def count(self, name, value=1):
+        self.current_counters[name] = self.current_counters.get(name, 0) + value
+
+    def end_frame(self):
+        # Phases and counters missing from a frame are recorded as 0 so that all series stay aligned
+        for values, current in ((self.timings, self.current_timings), (self.counters, self.current_counters)):
+            for name in current:
+                if name not in values:
+                    values[name] = cl.deque([0] * min(self.num_of_frames, self.window), maxlen=self.window)
+            for name, series in values.items():
+                series.append(current.get(name, 0))
+            current.clear()
+        self.num_of_frames = self.num_of_frames + 1
+
+    def reset(self):
+        self.timings.clear()
+        self.counters.clear()
+        self.current_timings.clear()
+        self.current_counters.clear()
+        self.num_of_frames = 0
+
+    def get_stats(self):
+        # Timings in microseconds per frame, with the share of each phase in the total time of the window
+        timings = {name: np.array(series, dtype=np.float64) / 1000 for name, series in self.timings.items()}
+        total = sum(values.sum() for values in timings.values())
+        stats = {"frames": min(self.num_of_frames, self.window), "timings": {}, "counters": {}}
+        for name, values in timings.items():
+            stats["timings"][name] = {
+                "mean": float(values.mean()),
+                "p50": float(np.percentile(values, 50)),
+                "p99": float(np.percentile(values, 99)),
+                "max": float(values.max()),
+                "share": float(values.sum() / total) if total > 0 else 0.0
+            }
+        for name, series in self.counters.items():
+            values = np.array(series, dtype=np.float64)
+            stats["counters"][name] = {"mean": float(values.mean()), "max": float(values.max())}
+        return stats
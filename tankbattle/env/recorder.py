@@ -0,0 +1,183 @@
+import os
+import pickle
+import struct
+import numpy as np
+from tankbattle.env.engine import TankBattle
+from tankbattle.env.constants import GlobalConstants
+
+
+class EpisodeRecorder(object):
+    # Records the episodes of a TankBattle game (see TankBattle.set_recorder) into a binary file. An episode is
+    # stored as the commands of its players, two little-endian uint16 per command (player, action) plus one per
+    # frame with the number of commands applied before that frame, and a snapshot of the game (save_state) every
+    # keyframe_interval frames. Episodes are appended as length-prefixed pickles so that a player can skip them
+
+    MAGIC = b"TBREC2\n"
+    LENGTH = struct.Struct("<Q")
+    MAX_PLAYERS = 1 << 16
+
+    def __init__(self, path, keyframe_interval=500):
+        if keyframe_interval <= 0:
+            raise ValueError("Invalid parameter ! keyframe_interval must be positive")
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(EpisodeRecorder.MAGIC)
+        self.episode = None
+        self.commands = []
+        self.counts = []
+        self.num_of_commands = 0
+        self.num_of_episodes = 0
+
+    def begin_episode(self, game):
+        self.end_episode()
+        if game.num_of_players > EpisodeRecorder.MAX_PLAYERS:
+            raise ValueError("Invalid parameter ! Episodes of more than " + str(EpisodeRecorder.MAX_PLAYERS) +
+                             " players cannot be recorded")
+        self.episode = {
+            "seed": game.seed,
+            "num_of_enemies": game.num_of_enemies,
+            "num_of_players": game.num_of_players,
+            "max_frames": game.max_frames,
+            "num_of_tiles": game.num_of_tiles,
+            "tile_size": game.tile_size,
+            "show_hud": game.show_hud,
+            "stage": game.current_stage,
+            "keyframes": [(0, game.save_state())]
+        }
+        self.commands = []
+        self.counts = []
+        self.num_of_commands = 0
+
+    def add_command(self, player, action):
+        if self.episode is not None:
+            self.commands.append((player, action))
+            self.num_of_commands = self.num_of_commands + 1
+
+    def end_frame(self, game):
+        if self.episode is None:
+            return
+        self.counts.append(self.num_of_commands)
+        self.num_of_commands = 0
+        if len(self.counts) % self.keyframe_interval == 0:
+            self.episode["keyframes"].append((len(self.counts), game.save_state()))
+        if game.is_terminal():
+            self.episode["scores"] = (game.total_score, game.total_score_p1, game.total_score_p2)
+
+    def end_episode(self):
+        # Episodes without any frame are dropped
+        if self.episode is None:
+            return
+        episode = self.episode
+        self.episode = None
+        if len(self.counts) == 0:
+            return
+        episode["num_of_frames"] = len(self.counts)
+        episode["counts"] = np.array(self.counts, dtype="<u2").tobytes()
+        episode["commands"] = np.array(self.commands, dtype="<u2").reshape(-1, 2).tobytes()
+        data = pickle.dumps(episode, protocol=pickle.HIGHEST_PROTOCOL)
+        self.file.write(EpisodeRecorder.LENGTH.pack(len(data)))
+        self.file.write(data)
+        self.file.flush()
+        self.num_of_episodes = self.num_of_episodes + 1
+
+    def close(self):
+        if self.file is not None:
+            self.end_episode()
+            self.file.close()
+            self.file = None
+
+
+class EpisodePlayer(object):
+    # Rebuilds any frame of a recorded episode: the game is restored from the closest keyframe before the frame
+    # and simulated forward with the recorded commands. Frame 0 is the first recorded state of the episode and
+    # frame i the state after i more frames. Playing forward from the current frame does not restore anything
+
+    def __init__(self, path, state_mode=GlobalConstants.RGB_STATE, state_size=GlobalConstants.GRAY_STATE_SIZE):
+        self.path = path
+        self.state_mode = state_mode
+        self.state_size = state_size
+        self.offsets = []
+        with open(path, "rb") as f:
+            if f.read(len(EpisodeRecorder.MAGIC)) != EpisodeRecorder.MAGIC:
+                raise ValueError("Invalid parameter ! Not a recording: " + str(path))
+            size = os.fstat(f.fileno()).st_size
+            offset = f.tell()
+            while offset + EpisodeRecorder.LENGTH.size <= size:
+                length = EpisodeRecorder.LENGTH.unpack(f.read(EpisodeRecorder.LENGTH.size))[0]
+                offset = offset + EpisodeRecorder.LENGTH.size
+                if offset + length > size:
+                    break
+                self.offsets.append((offset, length))
+                offset = offset + length
+                f.seek(offset)
+        self.game = None
+        self.game_config = None
+        self.episode = None
+        self.episode_index = -1
+        self.frame = -1
+
+    def get_num_of_episodes(self):
+        return len(self.offsets)
+
+    def load_episode(self, index):
+        if index != self.episode_index:
+            offset, length = self.offsets[index]
+            with open(self.path, "rb") as f:
+                f.seek(offset)
+                episode = pickle.loads(f.read(length))
+            counts = np.frombuffer(episode["counts"], dtype="<u2")
+            episode["starts"] = np.concatenate(([0], np.cumsum(counts, dtype=np.int64))).tolist()
+            episode["commands"] = np.frombuffer(episode["commands"], dtype="<u2").reshape(-1, 2).tolist()
+            self.episode = episode
+            self.episode_index = index
+            self.frame = -1
+        return self.episode
+
+    def get_num_of_frames(self, index):
+        return self.load_episode(index)["num_of_frames"]
+
+    def __get_game(self, episode):
+        # The game is reused across episodes of the same configuration since keyframes replace its whole state
+        config = (episode["num_of_enemies"], episode["num_of_players"], episode["max_frames"],
+                  episode["num_of_tiles"], episode["tile_size"], episode["show_hud"])
+        if self.game is None or config != self.game_config:
+            self.game = TankBattle(render=False, max_frames=episode["max_frames"], seed=episode["seed"],
+                                   num_of_enemies=episode["num_of_enemies"],
+                                   num_of_players=episode["num_of_players"],
+                                   player1_human_control=False, player2_human_control=False,
+                                   state_mode=self.state_mode, state_size=self.state_size,
+                                   num_of_tiles=episode["num_of_tiles"], tile_size=episode["tile_size"],
+                                   show_hud=episode["show_hud"])
+            self.game_config = config
+            self.frame = -1
+        return self.game
+
+    def seek(self, index, frame):
+        # Returns the replay game positioned at the given frame of the episode
+        episode = self.load_episode(index)
+        if frame < 0 or frame > episode["num_of_frames"]:
+            raise ValueError("Invalid parameter ! Frame out of range: " + str(frame))
+        game = self.__get_game(episode)
+
+        keyframe, state = 0, None
+        for kf, snapshot in episode["keyframes"]:
+            if kf > frame:
+                break
+            keyframe, state = kf, snapshot
+        if not keyframe <= self.frame <= frame:
+            game.restore_state(state)
+            self.frame = keyframe
+
+        commands = episode["commands"]
+        starts = episode["starts"]
+        for i in range(self.frame, frame):
+            for player, action in commands[starts[i]:starts[i + 1]]:
+                game.apply_command(player, action)
+            game.render()
+        self.frame = frame
+        return game
+
+    def get_frame(self, index, frame, mode=None, out=None):
+        return self.seek(index, frame).get_state(mode=mode, out=out)
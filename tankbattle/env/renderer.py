@@ -0,0 +1,112 @@
+import numpy as np
+from tankbattle.env.utils import Utils
+from tankbattle.env.core import ArrayCore
+from tankbattle.env.manager import ResourceManager
+
+
+class ArrayRenderer(object):
+    def __init__(self, core, rc_manager, screen_size, tile_size, show_hud=True):
+        self.core = core
+        self.rc = rc_manager
+        self.screen_size = screen_size
+        self.tile_size = tile_size
+        self.show_hud = show_hud
+        self.font = None
+        self.background = None
+        self.background_grid = None
+        self.hud_texts = {}
+
+    def __load_images(self):
+        # Images are only fetched once something is drawn
+        rc_manager = self.rc
+        core = self.core
+        self.font = rc_manager.get_font()
+        self.cell_images = {
+            ArrayCore.HARD_CELL: rc_manager.get_image(ResourceManager.HARD_WALL),
+            ArrayCore.SOFT_CELL: rc_manager.get_image(ResourceManager.SOFT_WALL),
+            ArrayCore.SEA_CELL: rc_manager.get_image(ResourceManager.SEA_WALL),
+            ArrayCore.BASE_CELL: rc_manager.get_image(ResourceManager.BASE),
+        }
+        self.tank_images = [rc_manager.get_tank_images(player) for player in range(core.num_of_players)] + \
+                           [rc_manager.get_tank_images(None)] * core.num_of_enemies
+        self.bullet_image = rc_manager.get_image(ResourceManager.BULLET)
+        self.explosion_images = [rc_manager.get_image(ResourceManager.EXPLOSION_1),
+                                 rc_manager.get_image(ResourceManager.EXPLOSION_2),
+                                 rc_manager.get_image(ResourceManager.EXPLOSION_3)]
+
+    def __scale(self, value):
+        return value * self.tile_size // self.core.tile_size
+
+    def __update_background(self, screen, grid):
+        # The background holds the walls and base of the last drawn grid: only the cells where the grid of the
+        # game differs (destroyed walls, or another game) are drawn again
+        if self.background is None:
+            self.background = screen.copy()
+            self.background.fill(Utils.get_color(Utils.BLACK))
+            self.background_grid = np.full(grid.shape, ArrayCore.EMPTY_CELL, dtype=grid.dtype)
+        ys, xs = np.nonzero(grid != self.background_grid)
+        if len(ys) == 0:
+            return
+        size = self.tile_size
+        black = Utils.get_color(Utils.BLACK)
+        for x, y, old, cell in zip(xs.tolist(), ys.tolist(), self.background_grid[ys, xs].tolist(),
+                                   grid[ys, xs].tolist()):
+            if old != ArrayCore.EMPTY_CELL:
+                self.background.fill(black, (x * size, y * size, size, size))
+            if cell != ArrayCore.EMPTY_CELL:
+                self.background.blit(self.cell_images[cell], (x * size, y * size))
+        self.background_grid[ys, xs] = grid[ys, xs]
+
+    def draw(self, screen, game=0, stage=0):
+        core = self.core
+        if self.font is None:
+            self.__load_images()
+
+        # Walls and base
+        self.__update_background(screen, core.grid[game])
+        screen.blit(self.background, (0, 0))
+
+        # Tanks
+        ts = np.nonzero(core.alive[game])[0]
+        px = self.__scale(core.px[game, ts])
+        screen.blits([(self.tank_images[t][core.direction[game, t]], (x, y)) for t, (x, y) in zip(ts, px)], False)
+
+        # Bullets
+        bs = np.nonzero(core.bullet_alive[game])[0]
+        px = self.__scale(core.bullet_pos[game, bs])
+        screen.blits([(self.bullet_image, (x, y)) for x, y in px], False)
+
+        # Explosions
+        es = np.nonzero(core.explosion_age[game] >= 0)[0]
+        px = self.__scale(core.explosion_pos[game, es])
+        frames = np.minimum(np.maximum(core.explosion_age[game, es] - 2, 0) // 2, 2)
+        screen.blits([(self.explosion_images[f], (x, y)) for f, (x, y) in zip(frames, px)], False)
+
+        if self.show_hud:
+            scores = core.scores[game]
+            self.draw_score(screen, core.total_score[game], scores[0], scores[1] if len(scores) > 1 else 0, stage)
+
+    def __hud_text(self, name, text):
+        # Texts are only rendered again when they change
+        cached = self.hud_texts.get(name)
+        if cached is None or cached[0] != text:
+            cached = (text, self.font.render(text, False, Utils.get_color(Utils.WHITE)))
+            self.hud_texts[name] = cached
+        return cached[1]
+
+    def draw_score(self, screen, total_score, score_p1, score_p2, stage):
+        if self.font is None:
+            self.__load_images()
+        total_score = self.__hud_text("total_score", 'Score:' + str(total_score))
+        screen.blit(total_score, (self.screen_size/2 - total_score.get_width()/2,
+                                  self.screen_size-self.tile_size + total_score.get_height()/1.3))
+
+        p1_score = self.__hud_text("p1_score", 'P1:' + str(score_p1))
+        screen.blit(p1_score, (10, self.screen_size-self.tile_size + p1_score.get_height()/1.3))
+
+        p2_score = self.__hud_text("p2_score", 'P2:' + str(score_p2))
+        screen.blit(p2_score, (self.screen_size - p2_score.get_width() - 10,
+                               self.screen_size-self.tile_size + p2_score.get_height()/1.3))
+
+        stage_text = self.__hud_text("stage", 'Stage ' + str(stage + 1))
+        screen.blit(stage_text, (self.screen_size/2 - stage_text.get_width()/2, stage_text.get_height()/1.3))
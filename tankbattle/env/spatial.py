@@ -0,0 +1,97 @@
+import pygame
+import numpy as np
+
+
+class OccupancyGrid(object):
+    # Number of rigid objects (walls, bases, tanks and the tiles tanks are moving to) on each tile
+
+    def __init__(self, num_of_tiles):
+        self.num_of_tiles = num_of_tiles
+        self.cells = np.zeros((num_of_tiles, num_of_tiles), dtype=np.int16)
+
+    def clear(self):
+        self.cells[:] = 0
+
+    def add(self, x, y):
+        self.cells[y, x] += 1
+
+    def remove(self, x, y):
+        self.cells[y, x] -= 1
+
+    def is_free(self, x, y):
+        return self.cells[y, x] == 0
+
+    def free_tiles(self, min_x, max_x, min_y, max_y):
+        # Free tiles inside [min_x, max_x) x [min_y, max_y) as (xs, ys)
+        ys, xs = np.nonzero(self.cells[min_y:max_y, min_x:max_x] == 0)
+        return xs + min_x, ys + min_y
+
+
+class SpatialHash(object):
+    # Sprites of a group bucketed by the tiles their rect overlaps. Collision queries only test the
+    # sprites sharing a tile with the query rect and return them in the order of the group, like
+    # pygame.sprite.spritecollide. Building the buckets costs about as much as a few brute force queries,
+    # so after invalidate() the first queries fall back to spritecollide and the buckets are only built
+    # once enough queries have been made
+
+    BUILD_AFTER_QUERIES = 8
+
+    def __init__(self, cell_size, group):
+        self.cell_size = cell_size
+        self.group = group
+        self.cells = {}
+        self.count = 0
+        self.is_stale = True
+        self.num_of_queries = 0
+        self.num_of_tests = 0   # rect tests since creation (for profiling)
+
+    def invalidate(self):
+        self.is_stale = True
+        self.num_of_queries = 0
+
+    def __build(self):
+        self.cells.clear()
+        self.count = 0
+        self.is_stale = False
+        for sprite in self.group:
+            self.add(sprite)
+
+    def add(self, sprite):
+        if self.is_stale:
+            return
+        entry = (self.count, sprite)
+        self.count = self.count + 1
+        rect = sprite.rect
+        size = self.cell_size
+        for x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                bucket = self.cells.get((x, y))
+                if bucket is None:
+                    self.cells[(x, y)] = [entry]
+                else:
+                    bucket.append(entry)
+
+    def collide(self, sprite, dokill):
+        # Sprites removed from the group since the buckets were built are ignored
+        if self.is_stale:
+            self.num_of_queries = self.num_of_queries + 1
+            if self.num_of_queries <= SpatialHash.BUILD_AFTER_QUERIES:
+                self.num_of_tests = self.num_of_tests + len(self.group)
+                return pygame.sprite.spritecollide(sprite, self.group, dokill)
+            self.__build()
+        rect = sprite.rect
+        size = self.cell_size
+        group = self.group
+        found = {}
+        for x in range(rect.left // size, (rect.right - 1) // size + 1):
+            for y in range(rect.top // size, (rect.bottom - 1) // size + 1):
+                bucket = self.cells.get((x, y), ())
+                self.num_of_tests = self.num_of_tests + len(bucket)
+                for index, other in bucket:
+                    if index not in found and group.has_internal(other) and rect.colliderect(other.rect):
+                        found[index] = other
+        hits = [found[index] for index in sorted(found)]
+        if dokill:
+            for other in hits:
+                other.kill()
+        return hits
@@ -11,6 +11,6 @@ class BaseSprite(pygame.sprite.Sprite):
         self.type = GlobalConstants.HARD_OBJECT
 
         self.image = sprite_bg
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, self.size, self.size)
         self.rect.x = self.pos_x * self.size
         self.rect.y = self.pos_y * self.size
\ No newline at end of file
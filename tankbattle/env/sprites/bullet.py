@@ -16,7 +16,7 @@ class BulletSprite(pygame.sprite.Sprite):
         self.owner = owner
         self.image = sprite_bg
 
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, self.size, self.size)
         adj_pos_x = 0
         adj_pos_y = 0
         if direction == GlobalConstants.LEFT_ACTION:
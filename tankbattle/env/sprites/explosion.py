@@ -8,7 +8,7 @@ class ExplosionSprite(pygame.sprite.Sprite):
         self.size = size
         self.images = sprites_bg
         self.image = self.images[0]
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, self.size, self.size)
         self.rect.x = abs_x
         self.rect.y = abs_y
         self.count = 0
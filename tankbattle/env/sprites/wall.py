@@ -10,6 +10,6 @@ class WallSprite(pygame.sprite.Sprite):
         self.pos_y = pos_y
         self.type = GlobalConstants.HARD_OBJECT
         self.image = sprite_bg
-        self.rect = self.image.get_rect()
+        self.rect = pygame.Rect(0, 0, self.size, self.size)
         self.rect.x = pos_x * self.size
         self.rect.y = pos_y * self.size
\ No newline at end of file
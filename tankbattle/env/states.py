@@ -0,0 +1,25 @@
+import pygame
+import numpy as np
+from tankbattle.env.utils import Utils
+
+
+class GrayscaleState(object):
+    # Downsamples the screen into a small grayscale state with an area filter (pygame smoothscale)
+    # and integer luma weights, without going through a full resolution float image. A screen rendered at the
+    # state size (see the tile_size of the games) is converted without resizing
+
+    def __init__(self, size):
+        self.size = size
+        self.surface, self.view = Utils.create_canvas(size, size)
+        self.weights = np.array([77, 150, 29], dtype=np.uint16)
+
+    def process(self, screen, out=None):
+        if screen.get_size() == (self.size, self.size):
+            view = pygame.surfarray.pixels3d(screen)
+        else:
+            pygame.transform.smoothscale(screen, (self.size, self.size), self.surface)
+            view = self.view
+        if out is None:
+            out = np.empty((self.size, self.size), dtype=np.uint8)
+        np.right_shift(np.dot(view, self.weights), 8, out=out, casting='unsafe')
+        return out
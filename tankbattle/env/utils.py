@@ -1,5 +1,5 @@
-from scipy.misc import imresize
 import time
+import pygame
 import numpy as np
 
 
@@ -21,8 +21,44 @@ class Utils():
         elif color == Utils.GRAY:
             return (80, 80, 80)
 
+    @staticmethod
+    def create_canvas(width, height):
+        # A surface that draws straight into a NumPy buffer, and a read-only RGB view of that buffer
+        # indexed [x, y] like pygame.surfarray.pixels3d (but without locking the surface)
+        pixels = np.zeros((height, width, 4), dtype=np.uint8)
+        surface = pygame.image.frombuffer(pixels, (width, height), 'RGBX')
+        view = pixels[:, :, :3].transpose(1, 0, 2)
+        view.flags.writeable = False
+        return surface, view
+
+    @staticmethod
+    def resize_area(image, width, height):
+        # Area average of a 2D image into (width, height) bins
+        rows = np.linspace(0, image.shape[0], width + 1).astype(int)
+        cols = np.linspace(0, image.shape[1], height + 1).astype(int)
+        sums = np.add.reduceat(np.add.reduceat(image, rows[:-1], axis=0), cols[:-1], axis=1)
+        return sums // np.outer(np.diff(rows), np.diff(cols))
+
     @staticmethod
     def process_state(state):
-        grayscale = np.dot(state[:, :, :3], [0.299, 0.587, 0.114])
-        resize = imresize(grayscale, (84, 84), interp='bilinear')
-        return resize
\ No newline at end of file
+        # Kept for compatibility, TankBattle(state_mode=GlobalConstants.GRAY_STATE) is much cheaper
+        grayscale = np.dot(state[:, :, :3].astype(np.uint32), [77, 150, 29]) >> 8
+        return Utils.resize_area(grayscale, 84, 84).astype(np.uint8)
+
+    @staticmethod
+    def get_player_spawns(stage, num_of_players):
+        # (x, y) spawn tiles of the players: empty tiles of the stage grid from the row of the base upwards,
+        # two tiles left and right of the base first (the original positions of players 1 and 2)
+        stage = np.asarray(stage)
+        height, width = stage.shape
+        base_x, base_y = width // 2, height - 2
+        offsets = [-2, 2, -4, 4, -3, 3, -1, 1] + [sign * d for d in range(5, width) for sign in (-1, 1)]
+        spawns = []
+        for y in range(base_y, 0, -1):
+            for d in offsets + ([0] if y != base_y else []):
+                x = base_x + d
+                if 1 <= x <= width - 2 and stage[y, x] < 0:
+                    spawns.append((x, y))
+                    if len(spawns) == num_of_players:
+                        return spawns
+        raise ValueError("Invalid parameter ! No room for " + str(num_of_players) + " players")
@@ -0,0 +1,172 @@
+import pygame
+import os
+import numpy as np
+from tankbattle.env.utils import Utils
+from tankbattle.env.constants import GlobalConstants
+from tankbattle.env.manager import ResourceManager
+from tankbattle.env.maps import StageMap
+from tankbattle.env.core import ArrayCore
+from tankbattle.env.renderer import ArrayRenderer
+from tankbattle.env.states import GrayscaleState
+
+
+class VecTankBattle(object):
+    # N games stepped in lockstep: every frame updates all games with the same array operations
+
+    def __init__(self, num_of_envs, max_frames=100000, frame_skip=1, seed=None, num_of_enemies=5,
+                 two_players=True, state_mode=GlobalConstants.RGB_STATE, state_size=GlobalConstants.GRAY_STATE_SIZE,
+                 num_of_players=None, num_of_tiles=None, tile_size=GlobalConstants.TILE_SIZE,
+                 bullets_per_tank=None, stages=None, random_stages=False, show_hud=True):
+
+        # tile_size is the size of a tile in image states, stages and random_stages select the stages of the games,
+        # see ArrayTankBattle. Image states show the scores unless show_hud is False
+        if num_of_tiles is None:
+            num_of_tiles = GlobalConstants.SCREEN_SIZE // GlobalConstants.TILE_SIZE
+        if num_of_tiles < GlobalConstants.MIN_NUM_OF_TILES:
+            raise ValueError("Invalid parameter ! num_of_tiles must be at least " +
+                             str(GlobalConstants.MIN_NUM_OF_TILES))
+        if tile_size <= 0:
+            raise ValueError("Invalid parameter ! tile_size must be positive")
+        if random_stages and stages is not None:
+            raise ValueError("Invalid parameter ! stages and random_stages are exclusive")
+
+        self.num_of_envs = num_of_envs
+        self.screen_size = num_of_tiles * tile_size
+        self.tile_size = tile_size
+        self.num_of_tiles = num_of_tiles
+        self.num_of_actions = GlobalConstants.NUM_OF_ACTIONS
+        if num_of_players is None:
+            num_of_players = 2 if two_players else 1
+        if num_of_players < 1:
+            raise ValueError("Invalid parameter ! num_of_players must be positive")
+        self.num_of_players = num_of_players
+        self.max_frames = max_frames
+        self.frame_skip = max(frame_skip, 1)
+        self.two_players = num_of_players > 1
+        self.current_path = os.path.dirname(os.path.abspath(__file__))
+        self.seed = seed
+        self.state_mode = state_mode
+        self.state_size = state_size
+
+        pygame.init()
+        self.screen = None
+        if state_mode != GlobalConstants.GRID_STATE:
+            self.screen, _ = Utils.create_canvas(self.screen_size, self.screen_size)
+        self.gray_state = GrayscaleState(state_size)
+        font_size = max(GlobalConstants.FONT_SIZE * tile_size // GlobalConstants.TILE_SIZE, 1)
+        self.rc_manager = ResourceManager(current_path=self.current_path, font_size=font_size,
+                                          tile_size=self.tile_size, is_render=False)
+        self.stage_map = StageMap(self.num_of_tiles, tile_size=self.tile_size, current_path=self.current_path,
+                                  sprites=None, walls=None, resources_manager=self.rc_manager, stages=stages)
+
+        self.core = ArrayCore(self.stage_map.get_grids(), num_of_games=num_of_envs,
+                              num_of_players=self.num_of_players, num_of_enemies=num_of_enemies,
+                              max_frames=max_frames, seed=seed, bullets_per_tank=bullets_per_tank,
+                              random_stages=random_stages)
+        self.renderer = ArrayRenderer(self.core, self.rc_manager, self.screen_size, self.tile_size,
+                                      show_hud=show_hud)
+
+        if state_mode == GlobalConstants.GRAY_STATE:
+            self.states = np.zeros((num_of_envs, state_size, state_size), dtype=np.uint8)
+        elif state_mode == GlobalConstants.GRID_STATE:
+            self.states = np.zeros((num_of_envs, self.num_of_tiles, self.num_of_tiles,
+                                    GlobalConstants.NUM_OF_GRID_PLANES), dtype=np.uint8)
+        elif state_mode == GlobalConstants.RGB_STATE:
+            self.states = np.zeros((num_of_envs, self.screen_size, self.screen_size, 3), dtype=np.uint8)
+        else:
+            raise ValueError("Invalid parameter ! Unknown state mode: " + str(state_mode))
+        # Rewards and scores have a column per player, at least two (player 2 is 0 in one player games).
+        # Episode scores start with the total score
+        self.rewards = np.zeros((num_of_envs, max(num_of_players, 2)), dtype=np.int64)
+        self.episode_scores = np.zeros((num_of_envs, 1 + max(num_of_players, 2)), dtype=np.int64)
+
+        # Filled by step(): games that ended by reaching max_frames, and the last states of the games that
+        # ended (one row per terminal game, in game order) since those games are restarted inside the step
+        self.truncations = np.zeros(num_of_envs, dtype=bool)
+        self.final_states = self.states[:0].copy()
+
+    def set_seed(self, seed):
+        self.seed = seed
+        self.core.rng = np.random.default_rng(seed)
+
+    def reset(self):
+        self.core.reset()
+        return self.get_states()
+
+    def step(self, actions):
+        # actions: (N,) for player 1 only or (N, num_of_players) for all players (extra columns are ignored)
+        actions = np.asarray(actions)
+        if actions.ndim == 1:
+            commands = np.full((self.num_of_envs, self.num_of_players), -1, dtype=np.int32)
+            commands[:, 0] = actions
+        else:
+            commands = actions[:, :self.num_of_players]
+        self.core.apply_actions(commands)
+
+        for _ in range(self.frame_skip):
+            self.core.update()
+
+        self.rewards[:, :self.num_of_players] = self.core.collect_rewards()
+        terminals = self.core.end_of_game.copy()
+        if self.max_frames > 0:
+            np.greater(self.core.frames, self.max_frames, out=self.truncations)
+        self.truncations &= terminals
+
+        # Finished games restart inside the batch
+        if terminals.any():
+            self.episode_scores[terminals, 0] = self.core.total_score[terminals]
+            self.episode_scores[terminals, 1:1 + self.num_of_players] = self.core.scores[terminals]
+            self.final_states = self.__get_states(np.nonzero(terminals)[0])
+            self.core.reset(terminals)
+        elif len(self.final_states) > 0:
+            self.final_states = self.states[:0].copy()
+
+        return self.get_states(), self.rewards.copy(), terminals
+
+    def __get_states(self, games):
+        # New array with the states of the given games only
+        if self.state_mode == GlobalConstants.GRID_STATE:
+            return self.core.get_grid_states()[games]
+        out = np.empty((len(games),) + self.states.shape[1:], dtype=np.uint8)
+        for i, game in enumerate(games):
+            self.renderer.draw(self.screen, game=game, stage=self.core.stage[game])
+            if self.state_mode == GlobalConstants.GRAY_STATE:
+                self.gray_state.process(self.screen, out=out[i])
+            else:
+                pygame.pixelcopy.surface_to_array(out[i], self.screen)
+        return out
+
+    def get_states(self):
+        if self.state_mode == GlobalConstants.GRID_STATE:
+            return self.core.get_grid_states(out=self.states)
+        for i in range(self.num_of_envs):
+            self.renderer.draw(self.screen, game=i, stage=self.core.stage[i])
+            if self.state_mode == GlobalConstants.GRAY_STATE:
+                self.gray_state.process(self.screen, out=self.states[i])
+            else:
+                pygame.pixelcopy.surface_to_array(self.states[i], self.screen)
+        return self.states
+
+    def get_frame(self, game, out=None):
+        # (screen_size, screen_size, 3) uint8 RGB image of one game indexed [x, y], whatever the state mode
+        if out is None:
+            out = np.empty((self.screen_size, self.screen_size, 3), dtype=np.uint8)
+        if self.screen is None:
+            self.screen, _ = Utils.create_canvas(self.screen_size, self.screen_size)
+        self.renderer.draw(self.screen, game=game, stage=self.core.stage[game])
+        pygame.pixelcopy.surface_to_array(out, self.screen)
+        return out
+
+    def get_num_of_envs(self):
+        return self.num_of_envs
+
+    def get_num_of_actions(self):
+        return self.num_of_actions
+
+    def get_action_space(self):
+        return range(self.num_of_actions)
+
+    def get_state_space(self):
+        if self.state_mode == GlobalConstants.GRID_STATE:
+            return list(self.states.shape[1:])
+        return list(self.states.shape[1:3])